@@ -0,0 +1,62 @@
+# 按格子索引的动画存储：动画记录使用 __slots__ 并放回对象池重复利用，
+# 位移按经过的时间插值，播放速度与帧率无关
+
+
+class Animation:
+    __slots__ = ("row", "col", "kind", "dx", "dy", "start", "duration")
+
+
+class AnimationStore:
+    def __init__(self):
+        self.now = 0.0  # 动画时间（秒），只在 update 时前进，暂停时不走
+        self.active = {}  # (row, col) -> Animation
+        self.pool = []
+
+    def __len__(self):
+        return len(self.active)
+
+    def __bool__(self):
+        return bool(self.active)
+
+    def __contains__(self, cell):
+        return cell in self.active
+
+    def add(self, row, col, kind, dx, dy, duration):
+        # 在 (row, col) 上添加动画：方块从偏移 (dx, dy) 处开始，duration 秒后回到格子位置
+        # 同一格子上的旧动画会被替换
+        key = (row, col)
+        anim = self.active.get(key)
+        if anim is None:
+            anim = self.pool.pop() if self.pool else Animation()
+            self.active[key] = anim
+        anim.row = row
+        anim.col = col
+        anim.kind = kind
+        anim.dx = dx
+        anim.dy = dy
+        anim.start = self.now
+        anim.duration = duration
+
+    def offset(self, row, col, ahead=0.0):
+        # 返回格子当前的绘制偏移，ahead 用于在两次更新之间插值
+        anim = self.active.get((row, col))
+        if anim is None or anim.duration <= 0:
+            return 0, 0
+        remaining = 1.0 - (self.now + ahead - anim.start) / anim.duration
+        if remaining <= 0:
+            return 0, 0
+        if remaining > 1:
+            remaining = 1.0
+        return anim.dx * remaining, anim.dy * remaining
+
+    def update(self, dt):
+        # 推进动画时间并回收已完成的动画，开销只与活动动画数量有关
+        self.now += dt
+        now = self.now
+        finished = [key for key, anim in self.active.items() if now - anim.start >= anim.duration]
+        for key in finished:
+            self.pool.append(self.active.pop(key))
+
+    def clear(self):
+        self.pool.extend(self.active.values())
+        self.active.clear()
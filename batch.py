@@ -0,0 +1,173 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from engine import Engine, GRID_SIZE, COLORS, SCORE_PER_TILE, EMPTY
+
+# 基于 NumPy 的批量引擎：把 N 个独立棋盘放在一个 (N, size, size) 的 int8 数组里，
+# 查找匹配、消除计分、下落和补充都对整批棋盘做向量化运算，没有逐棋盘的 Python 循环
+
+
+class BatchEngine:
+    def __init__(self, num_boards, grid_size=GRID_SIZE, num_colors=None, seed=None):
+        self.num_boards = num_boards
+        self.grid_size = grid_size
+        self.num_colors = len(COLORS) if num_colors is None else num_colors
+        self.rng = np.random.default_rng(seed)
+        self.grids = np.empty((num_boards, grid_size, grid_size), dtype=np.int8)
+        self.scores = np.zeros(num_boards, dtype=np.int64)
+        self.initialize_grids()
+
+    def random_tiles(self, shape):
+        return self.rng.integers(0, self.num_colors, shape, dtype=np.int8)
+
+    def initialize_grids(self):
+        # 与 engine.match_free_grid 相同的构造方法，逐格对整批棋盘同时填色：
+        # 每格避开会和左边两格或上边两格连成三连的颜色，一遍生成没有匹配的棋盘，分数清零
+        if self.num_colors < 3:
+            raise ValueError("生成没有三连的棋盘至少需要 3 种颜色")
+        grids = self.grids
+        none = np.full(self.num_boards, self.num_colors, dtype=np.int8)  # 表示没有排除颜色
+        for row in range(self.grid_size):
+            for col in range(self.grid_size):
+                left = none
+                if col >= 2:
+                    left = np.where(grids[:, row, col - 1] == grids[:, row, col - 2], grids[:, row, col - 1], none)
+                up = none
+                if row >= 2:
+                    up = np.where(grids[:, row - 1, col] == grids[:, row - 2, col], grids[:, row - 1, col], none)
+                up = np.where(up == left, none, up)
+                low = np.minimum(left, up)
+                high = np.maximum(left, up)
+                excluded = (low < self.num_colors).astype(np.int8) + (high < self.num_colors)
+                color = (self.rng.random(self.num_boards) * (self.num_colors - excluded)).astype(np.int8)
+                color += color >= low
+                color += color >= high
+                grids[:, row, col] = color
+        self.scores[:] = 0
+
+    def find_matches(self):
+        # 返回 (N, size, size) 的布尔数组，标记所有处于三连及以上的格子
+        grids = self.grids
+        matches = np.zeros(grids.shape, dtype=bool)
+        valid = grids[:, :, :-2] >= 0
+        horizontal = valid & (grids[:, :, :-2] == grids[:, :, 1:-1]) & (grids[:, :, 1:-1] == grids[:, :, 2:])
+        matches[:, :, :-2] |= horizontal
+        matches[:, :, 1:-1] |= horizontal
+        matches[:, :, 2:] |= horizontal
+        valid = grids[:, :-2, :] >= 0
+        vertical = valid & (grids[:, :-2, :] == grids[:, 1:-1, :]) & (grids[:, 1:-1, :] == grids[:, 2:, :])
+        matches[:, :-2, :] |= vertical
+        matches[:, 1:-1, :] |= vertical
+        matches[:, 2:, :] |= vertical
+        return matches
+
+    def remove_matches(self, matches=None):
+        # 移除匹配的方块并给每个棋盘计分，返回每个棋盘消除的方块数
+        if matches is None:
+            matches = self.find_matches()
+        counts = matches.sum(axis=(1, 2))
+        self.scores += counts * SCORE_PER_TILE
+        self.grids[matches] = EMPTY
+        return counts
+
+    def fill_empty_cells(self):
+        # 按列稳定排序：空格（False）排到上方，方块保持原有顺序落到底部
+        occupied = self.grids >= 0
+        order = np.argsort(occupied, axis=1, kind="stable")
+        self.grids = np.take_along_axis(self.grids, order, axis=1)
+
+        # 在顶部生成新方块
+        empty = self.grids < 0
+        self.grids[empty] = self.random_tiles(int(empty.sum()))
+
+    def swap(self, pos1, pos2, boards=None):
+        # pos1/pos2 为 (rows, cols) 数组对，boards 中的每个棋盘各交换一对格子
+        if boards is None:
+            boards = np.arange(self.num_boards)
+        shape = (self.num_boards,)
+        rows1, cols1 = (np.broadcast_to(a, shape)[boards] for a in pos1)
+        rows2, cols2 = (np.broadcast_to(a, shape)[boards] for a in pos2)
+        first = self.grids[boards, rows1, cols1]
+        self.grids[boards, rows1, cols1] = self.grids[boards, rows2, cols2]
+        self.grids[boards, rows2, cols2] = first
+
+    def try_swap(self, pos1, pos2):
+        # 交换后没有形成匹配的棋盘换回原样，返回每个棋盘是否交换成功
+        self.swap(pos1, pos2)
+        valid = self.find_matches().any(axis=(1, 2))
+        self.swap(pos1, pos2, np.flatnonzero(~valid))
+        return valid
+
+    def settle(self):
+        # 对整批棋盘连续消除直到全部稳定，返回每个棋盘的连锁层数
+        chains = np.zeros(self.num_boards, dtype=np.int32)
+        while True:
+            matches = self.find_matches()
+            active = matches.any(axis=(1, 2))
+            if not active.any():
+                return chains
+            chains += active
+            self.remove_matches(matches)
+            self.fill_empty_cells()
+
+
+def _scalar_settle(engines):
+    for engine in engines:
+        while engine.find_matches():
+            engine.remove_matches()
+            engine.fill_empty_cells()
+
+
+def benchmark(num_boards, grid_size=GRID_SIZE, rounds=5, seed=0):
+    # 对比批量引擎和逐个调用 Engine 方法，从相同的随机棋盘开始消除到稳定
+    num_colors = len(COLORS)
+    batch = BatchEngine(num_boards, grid_size, num_colors, seed)
+    engines = [Engine(grid_size, num_colors, rng=random.Random(seed + i)) for i in range(num_boards)]
+
+    batch_time = 0.0
+    scalar_time = 0.0
+    for _ in range(rounds):
+        start = batch.random_tiles(batch.grids.shape)
+
+        batch.grids[...] = start
+        began = time.perf_counter()
+        batch.settle()
+        batch_time += time.perf_counter() - began
+
+        for engine, grid in zip(engines, start.tolist()):
+            engine.grid = grid
+            engine.mark_all_dirty()
+        began = time.perf_counter()
+        _scalar_settle(engines)
+        scalar_time += time.perf_counter() - began
+
+    boards = num_boards * rounds
+    return {
+        "boards": boards,
+        "grid_size": grid_size,
+        "batch_boards_per_sec": boards / batch_time,
+        "scalar_boards_per_sec": boards / scalar_time,
+        "speedup": scalar_time / batch_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量引擎吞吐量测试")
+    parser.add_argument("--boards", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=GRID_SIZE)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = benchmark(args.boards, args.size, args.rounds, args.seed)
+    print(f"{result['boards']} 个 {args.size}x{args.size} 棋盘消除到稳定:")
+    print(f"  批量引擎: {result['batch_boards_per_sec']:.0f} 盘/秒")
+    print(f"  逐个引擎: {result['scalar_boards_per_sec']:.0f} 盘/秒")
+    print(f"  加速比: {result['speedup']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
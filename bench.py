@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import snapshot
+from engine import Engine, GRID_SIZE, COLORS
+
+# 基准测试：棋盘逻辑和帧绘制的耗时，使用固定种子，结果输出为 JSON，
+# 可以与保存的基线对比，发现性能回退时以非零状态退出
+
+LOGIC_SIZES = [8, 16, 64, 256]
+RENDER_SCENARIOS = ["static", "cascade", "pause", "instructions", "large"]
+LARGE_RENDER_SIZE = 128  # large 场景在大棋盘上连续连锁，只绘制视口内的格子
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "median_us": statistics.median(samples) * 1e6,
+        "min_us": samples[0] * 1e6,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+    }
+
+
+def measure(setup, func, min_time, min_runs=3, max_runs=1000):
+    # 每次调用前执行 setup（不计时），累计计时达到 min_time 秒后停止
+    samples = []
+    total = 0.0
+    while len(samples) < max_runs and (total < min_time or len(samples) < min_runs):
+        state = setup()
+        began = time.perf_counter()
+        func(state)
+        elapsed = time.perf_counter() - began
+        samples.append(elapsed)
+        total += elapsed
+    return summarize(samples)
+
+
+def bench_logic(size, seed, min_time):
+    rng = random.Random(seed)
+    engine = Engine(size, len(COLORS), seed=seed)
+    num_colors = engine.num_colors
+
+    def random_grid():
+        grid = [[rng.randrange(num_colors) for _ in range(size)] for _ in range(size)]
+        engine.grid = grid
+        engine.mark_all_dirty()
+        return engine
+
+    def with_holes():
+        random_grid()
+        engine.remove_matches()
+        return engine
+
+    settled = [list(line) for line in engine.grid]
+
+    def settled_move():
+        engine.grid = [list(line) for line in settled]
+        engine.mark_all_dirty()
+        engine.paused = False
+        engine.victory = False
+        engine.game_over = False
+        return engine.hint()
+
+    results = {}
+    results["initialize_grid"] = measure(lambda: engine, lambda e: e.initialize_grid(), min_time, max_runs=50)
+    results["find_matches"] = measure(random_grid, lambda e: e.find_matches(), min_time)
+    results["remove_matches"] = measure(random_grid, lambda e: e.remove_matches(), min_time)
+    results["fill_empty_cells"] = measure(with_holes, lambda e: e.fill_empty_cells(), min_time)
+    results["cascade"] = measure(settled_move, lambda move: engine.apply_move(*move, record=False), min_time)
+
+    # 快照：保存、恢复到已有引擎、从快照创建新引擎（复制局面），结果里附带快照字节数
+    settled_move()
+    data = snapshot.save(engine)
+    results["snapshot_save"] = measure(lambda: engine, snapshot.save, min_time)
+    results["snapshot_save"]["bytes"] = len(data)
+    results["snapshot_restore"] = measure(lambda: engine, lambda e: snapshot.restore(e, data), min_time)
+    results["snapshot_load"] = measure(lambda: data, snapshot.load, min_time)
+    return results
+
+
+def bench_render(scenario, seed, frames):
+    # 在 SDL 的 dummy 视频驱动下测量每帧 update_animations + draw + present 的耗时
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import xxl
+
+    if xxl.screen is None:
+        xxl.init_display()
+    game = xxl.Game(grid_size=LARGE_RENDER_SIZE if scenario == "large" else GRID_SIZE, seed=seed)
+    if scenario == "pause":
+        Engine.toggle_pause(game)
+    elif scenario == "instructions":
+        game.show_instructions = True
+        Engine.toggle_pause(game)
+
+    def next_move():
+        # 连锁场景：上一步回放完后立即走下一步提示的交换
+        if game.victory or game.game_over:
+            game.restart()
+        log = game.apply_move(*game.hint())
+        game.start_playback(log)
+
+    # 预热一帧，完成首次整屏绘制
+    game.draw()
+    game.present()
+
+    # 暂停和说明场景下画面不变，脏矩形绘制会跳过整帧；每帧强制整屏重绘，测量弹窗的绘制开销
+    overlay = scenario in ("pause", "instructions")
+    samples = []
+    for _ in range(frames):
+        if overlay:
+            game.invalidate_all()
+        began = time.perf_counter()
+        if scenario in ("cascade", "large") and not game.is_playing():
+            next_move()
+        game.update_animations(xxl.LOGIC_STEP)
+        game.draw()
+        game.present()
+        samples.append(time.perf_counter() - began)
+    return summarize(samples)
+
+
+def bench_startup(seed, runs):
+    # 在子进程中启动游戏，绘制出第一帧后立即退出；计时包括解释器启动和导入模块
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "xxl.py")
+    command = [sys.executable, script, "--startup-time", "--seed", str(seed)]
+    samples = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - began)
+    return summarize(samples)
+
+
+def run(args):
+    results = {}
+    for size in args.sizes:
+        for name, result in bench_logic(size, args.seed, args.min_time).items():
+            results[f"logic.{name}.{size}"] = result
+            size_text = f" ({result['bytes']} 字节)" if "bytes" in result else ""
+            print(f"logic.{name}.{size}: {result['median_us']:.1f} us{size_text}", file=sys.stderr)
+    if not args.no_render:
+        try:
+            import pygame  # noqa: F401
+        except ImportError:
+            print("未安装 pygame，跳过绘制基准", file=sys.stderr)
+        else:
+            for scenario in RENDER_SCENARIOS:
+                result = bench_render(scenario, args.seed, args.frames)
+                results[f"render.{scenario}"] = result
+                print(f"render.{scenario}: {result['median_us']:.1f} us", file=sys.stderr)
+            if args.startup_runs:
+                result = bench_startup(args.seed, args.startup_runs)
+                results["startup.first_frame"] = result
+                print(f"startup.first_frame: {result['median_us'] / 1000:.1f} ms", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    # 中位数比基线慢超过 threshold（比例）即视为回退，返回回退项列表
+    regressions = []
+    for name, result in sorted(report["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name}: 新增 {result['median_us']:.1f} us")
+            continue
+        ratio = result["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- 回退"
+            regressions.append(name)
+        print(f"{name}: {base['median_us']:.1f} -> {result['median_us']:.1f} us ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="棋盘逻辑和帧绘制基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=LOGIC_SIZES, help="逻辑基准的棋盘大小")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-time", type=float, default=0.2, help="每项逻辑基准的最少累计计时（秒）")
+    parser.add_argument("--frames", type=int, default=300, help="每个绘制场景测量的帧数")
+    parser.add_argument("--no-render", action="store_true", help="跳过绘制基准")
+    parser.add_argument("--startup-runs", type=int, default=5, help="测量启动到第一帧的次数，0 表示跳过")
+    parser.add_argument("--output", "-o", help="把结果写入 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--compare", metavar="BASELINE", help="与基线 JSON 对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定回退的相对阈值")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 项性能回退: {', '.join(regressions)}")
+            sys.exit(1)
+        print("没有性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,644 @@
+import random
+import time
+
+# 纯逻辑的消消乐规则引擎，不依赖 pygame，可在无显示环境下运行
+
+# 游戏规则常量
+GRID_SIZE = 8
+COLORS = [
+    (255, 0, 0),    # 红色
+    (0, 255, 0),    # 绿色
+    (0, 0, 255),    # 蓝色
+    (255, 255, 0),  # 黄色
+    (255, 0, 255),  # 紫色
+    (0, 255, 255),  # 青色
+]
+GAME_TIME = 60  # 游戏时间（秒）
+TARGET_SCORE = 1000  # 通关目标分数
+SCORE_PER_TILE = 10  # 每个方块的得分
+EMPTY = -1  # 空格
+
+# 事件日志中的事件类型
+# ("swap", pos1, pos2)
+# ("remove", level, cells)
+# ("fall", level, row, col, to_row)
+# ("spawn", level, row, col, color)
+# ("score", level, delta)
+# ("shuffle", level, grid)
+EVENT_SWAP = "swap"
+EVENT_REMOVE = "remove"
+EVENT_FALL = "fall"
+EVENT_SPAWN = "spawn"
+EVENT_SCORE = "score"
+EVENT_SHUFFLE = "shuffle"  # ("shuffle", level, grid)，死局后重新洗牌
+
+
+class Engine:
+    # 服务器上同时存在大量引擎，用 __slots__ 省掉每个实例的属性字典（子类 Game 仍然有字典）
+    __slots__ = (
+        "grid_size", "game_time", "target_score", "num_colors", "clock", "seed", "rng", "grid",
+        "dirty_cells", "_dirty_cols", "_hole_cols", "_matches", "touched", "_touched_cols", "moves",
+        "log", "level", "cascade_log", "record", "score", "game_over", "victory", "paused",
+        "paused_remaining_time", "start_time", "end_time",
+    )
+
+    def __init__(self, grid_size=GRID_SIZE, num_colors=None, clock=None, rng=None, seed=None,
+                 game_time=GAME_TIME, target_score=TARGET_SCORE, grid=None,
+                 moves=None):
+        # clock 为返回秒数的可调用对象，rng 为 random.Random 实例，均可注入
+        # 没有注入 rng 时使用按 seed 初始化的独立随机数生成器，seed 为 None 时随机选取并记录下来
+        # target_score 为 None 时不会通关，一直玩到时间用完（批量模拟用）
+        # grid 不为 None 时直接使用这个已稳定的棋盘，不重新生成（从快照恢复用），
+        # moves 是它的合法交换索引 {交换: 消除数}，为 None 时重建
+        self.grid_size = grid_size
+        self.game_time = game_time
+        self.target_score = target_score
+        self.num_colors = len(COLORS) if num_colors is None else num_colors
+        self.clock = clock if clock is not None else time.time
+        if rng is None:
+            if seed is None:
+                seed = random.SystemRandom().getrandbits(63)
+            rng = random.Random(seed)
+        self.seed = seed
+        self.rng = rng
+        self.grid = []
+        # 增量匹配检测：任何三连都至少包含一个脏格子，只需从脏格子出发检查
+        # 下落使整段列发生变化，按列记录"某行及以上全部变化"，不逐格展开
+        self.dirty_cells = set()
+        self._dirty_cols = {}  # 列 -> 最低的脏行，该行及以上都是脏格子
+        self._hole_cols = {}  # 含有空格、等待下落填充的列 -> 最低空格所在行
+        self._matches = None  # find_matches 的缓存，棋盘变化时失效
+        self.touched = set()  # 上次更新合法交换索引后发生变化的格子
+        self._touched_cols = {}  # 列 -> 最低的变化行，该行及以上都发生了变化
+        self.moves = MoveIndex(self)  # 合法交换索引
+        # 事件日志：apply_move 期间记录棋盘变化，供前端回放；为 None 时不记录
+        self.log = None
+        self.level = 0  # 当前连锁层数
+        self.cascade_log = None  # begin_move 之后、连锁结算完之前的事件日志
+        self.record = False  # 正在结算的连锁是否记录完整事件
+        self.score = 0
+        self.game_over = False
+        self.victory = False
+        self.paused = False
+        self.paused_remaining_time = game_time
+        self.start_time = 0
+        self.end_time = 0
+        if grid is None:
+            self.initialize_grid()
+        else:
+            self.set_grid(grid, moves)
+        self.reset_game()
+
+    def reset_game(self):
+        # 重置游戏状态
+        self.score = 0
+        self.game_over = False
+        self.victory = False
+        self.paused = False
+        self.paused_remaining_time = self.game_time
+        self.start_time = self.clock()
+        self.end_time = self.start_time + self.game_time  # 设置结束时间
+
+    def restart(self):
+        # 重新生成棋盘并重置分数和计时；未结算完的连锁先结算，随机数的消耗与一次性结算时一致
+        self.finish_move()
+        self.initialize_grid()
+        self.reset_game()
+
+    def mark_all_dirty(self):
+        # 直接修改 self.grid 后必须调用，让下一次检测重新检查整个棋盘
+        size = self.grid_size
+        self._dirty_cols = dict.fromkeys(range(size), size - 1)
+        self._hole_cols = dict.fromkeys(range(size), size - 1)
+        self._matches = None
+        self.moves.stale = True
+
+    def mark_cell(self, row, col):
+        self.dirty_cells.add((row, col))
+        self.touched.add((row, col))
+        self._matches = None
+
+    def random_color(self):
+        return self.rng.randrange(self.num_colors)
+
+    def initialize_grid(self):
+        # 创建初始网格
+        self.generate_grid()
+
+    def set_grid(self, grid, moves=None):
+        # 换上一个已经稳定（没有三连和空格）的棋盘；给出 moves 时直接使用，否则重建合法交换索引
+        self.grid = grid
+        self.cascade_log = None
+        self.level = 0
+        self.dirty_cells.clear()
+        self._dirty_cols.clear()
+        self._hole_cols.clear()
+        self._matches = set()
+        self.touched.clear()
+        self._touched_cols.clear()
+        if moves is None:
+            self.moves.stale = True
+            self.refresh_moves()
+        else:
+            self.moves.moves = moves
+            self.moves.stale = False
+
+    def generate_grid(self):
+        # 一次构造出没有三连的棋盘，开销与格子数成正比
+        size = self.grid_size
+        while True:
+            self.grid = match_free_grid(size, self.num_colors, self.rng)
+            self.mark_all_dirty()
+            # 构造保证没有三连和空格，不需要再扫描
+            self.dirty_cells.clear()
+            self._dirty_cols.clear()
+            self._hole_cols.clear()
+            self._matches = set()
+
+            # 确保至少有一个合法交换，没有时植入一个
+            if self.refresh_moves():
+                return
+            if self.plant_move() and self.refresh_moves():
+                return
+
+    def plant_move(self):
+        # 植入一个合法交换：(r, c)、(r, c+1)、(r+1, c+2) 同色，(r, c+2) 异色，
+        # 交换 (r, c+2) 和 (r+1, c+2) 即可三连；也尝试转置后的形状
+        # 只接受不会产生三连的位置和颜色，返回是否植入成功
+        size = self.grid_size
+        grid = self.grid
+        candidates = [(row, col, transpose) for row in range(size - 1) for col in range(size - 2) for transpose in (False, True)]
+        self.rng.shuffle(candidates)
+        for row, col, transpose in candidates:
+            cells = [(row, col), (row, col + 1), (row + 1, col + 2)]
+            target_row, target_col = row, col + 2
+            if transpose:
+                cells = [(c, r) for r, c in cells]
+                target_row, target_col = target_col, target_row
+            old = [grid[r][c] for r, c in cells]
+            for color in range(self.num_colors):
+                if color == grid[target_row][target_col]:
+                    continue
+                for r, c in cells:
+                    grid[r][c] = color
+                if not any(_match_count(grid, size, r, c) for r, c in cells):
+                    for r, c in cells:
+                        self.touched.add((r, c))
+                    return True
+            for (r, c), color in zip(cells, old):
+                grid[r][c] = color
+        return False
+
+    def refresh_moves(self):
+        # 根据变化过的格子增量更新合法交换索引，返回是否还有合法交换
+        self.moves.update(self.touched, self._touched_cols)
+        self.touched.clear()
+        self._touched_cols.clear()
+        return bool(self.moves)
+
+    def reshuffle(self):
+        # 死局时打乱现有方块，直到没有匹配且至少有一个合法交换
+        size = self.grid_size
+        tiles = [color for line in self.grid for color in line]
+        for _ in range(100):
+            self.rng.shuffle(tiles)
+            self.grid = [tiles[row * size:(row + 1) * size] for row in range(size)]
+            self.mark_all_dirty()
+            if not self.find_matches() and self.refresh_moves():
+                return
+        # 现有方块无法排出可玩的棋盘时重新生成
+        self.generate_grid()
+
+    def is_legal(self, pos1, pos2):
+        # 直接在棋盘上检查两个格子，不需要先更新合法交换索引
+        size = self.grid_size
+        if not self.is_adjacent(pos1, pos2) or not all(0 <= value < size for value in (*pos1, *pos2)):
+            return False
+        (row1, col1), (row2, col2) = MoveIndex.key(pos1, pos2)
+        return self.moves.count(row1, col1, row2, col2) > 0
+
+    def has_moves(self):
+        # 连锁结束后判断是否死局：先逐个验证索引里已有的交换，大棋盘上一步只改变一小部分格子，
+        # 通常第一个就仍然合法，不必更新整个索引；都不合法时才更新索引
+        if not self.moves.stale:
+            count = self.moves.count
+            for (row1, col1), (row2, col2) in self.moves.moves:
+                if count(row1, col1, row2, col2):
+                    return True
+        return self.refresh_moves()
+
+    def hint(self):
+        # 返回一次能消除最多方块的合法交换，没有时返回 None
+        self.sync_moves()
+        return self.moves.best_move()
+
+    def sync_moves(self):
+        # 合法交换索引是延迟更新的：走棋只记录变化的格子，读取索引（len、遍历、hint）时才更新
+        # 棋盘在 apply_move 之外被修改过时（直接赋值 grid 或调用 swap）同样在这里补上
+        if self.moves.stale or self.touched or self._touched_cols:
+            self.refresh_moves()
+
+    def get_remaining_time(self):
+        # 计算剩余时间
+        if self.paused or self.game_over or self.victory:
+            # 如果游戏暂停、结束或通关，返回暂停/结束时的剩余时间
+            return self.paused_remaining_time
+        # 如果游戏进行中，返回实际剩余时间
+        return max(0, self.end_time - self.clock())
+
+    def update_timer(self):
+        # 检查时间是否用完；时间到时立即结算完未结算的连锁，分数与录像回放一致
+        if self.get_remaining_time() <= 0 and not self.victory:
+            self.game_over = True
+            self.paused = True  # 游戏结束时暂停
+            self.paused_remaining_time = 0
+            self.finish_move()
+
+    def toggle_pause(self):
+        # 切换暂停状态
+        if self.paused:
+            # 恢复游戏，计算新的结束时间
+            self.paused = False
+            self.end_time = self.clock() + self.paused_remaining_time
+        else:
+            # 暂停游戏，记录当前剩余时间
+            self.paused = True
+            self.paused_remaining_time = max(0, self.end_time - self.clock())
+
+    @staticmethod
+    def is_adjacent(pos1, pos2):
+        row1, col1 = pos1
+        row2, col2 = pos2
+        return (abs(row1 - row2) == 1 and col1 == col2) or (abs(col1 - col2) == 1 and row1 == row2)
+
+    def apply_move(self, pos1, pos2, record=True):
+        # 交换两个相邻方块并一次性结算整个连锁
+        # 非法交换（暂停、不相邻或没有形成匹配）返回 None，棋盘不变
+        # 否则返回按连锁层排序的事件日志；record=False 时只记录每层的得分事件
+        log = self.begin_move(pos1, pos2, record)
+        if log is not None:
+            self.finish_move()
+        return log
+
+    def begin_move(self, pos1, pos2, record=True):
+        # 只执行交换，连锁由 resolve_level 逐层结算，每层的事件追加到返回的日志里
+        # 前端每播放完一层才结算下一层，大棋盘上的长连锁不会集中在一帧里计算
+        # 先检查时间：结束时间之后的交换一律拒绝，实时游戏、录像回放和服务器的判定一致
+        self.update_timer()
+        if self.cascade_log is not None or self.paused or self.game_over or not self.is_legal(pos1, pos2):
+            return None
+        self.swap(pos1, pos2)
+        self.cascade_log = [(EVENT_SWAP, pos1, pos2)]
+        self.record = record
+        return self.cascade_log
+
+    def resolve_level(self):
+        # 结算一层连锁；没有新的匹配时检查死局（必要时洗牌）并结束连锁
+        # 返回是否还有未结算的连锁
+        log = self.cascade_log
+        if log is None:
+            return False
+        if self.find_matches():
+            self.level += 1
+            if self.record:
+                self.log = log
+            before = self.score
+            self.remove_matches()
+            self.fill_empty_cells()
+            self.log = None
+            log.append((EVENT_SCORE, self.level, self.score - before))
+            return True
+        if not self.has_moves():
+            self.reshuffle()
+            log.append((EVENT_SHUFFLE, self.level, [list(line) for line in self.grid]))
+        self.cascade_log = None
+        self.level = 0
+        return False
+
+    def finish_move(self):
+        # 一次结算完剩余的连锁（重新开始、保存快照或录像前必须先结算完）
+        while self.resolve_level():
+            pass
+
+    def swap(self, pos1, pos2):
+        # 交换两个位置的方块
+        row1, col1 = pos1
+        row2, col2 = pos2
+        grid = self.grid
+        grid[row1][col1], grid[row2][col2] = grid[row2][col2], grid[row1][col1]
+        self.mark_cell(row1, col1)
+        self.mark_cell(row2, col2)
+
+    def find_matches(self):
+        # 查找所有匹配项（水平或垂直三个或更多相同方块）
+        # 只从脏格子出发向两侧延伸检查；检查后只有在匹配中的格子保持脏直到被消除，
+        # 开销只与变化的格子数有关。整段变化的列逐行检查水平连线，竖直连线整段扫描一次
+        if self._matches is not None:
+            return list(self._matches)
+        grid = self.grid
+        last = self.grid_size - 1
+        matches = set()
+        for row, col in self.dirty_cells:
+            line = grid[row]
+            color = line[col]
+            if color < 0:
+                continue
+            left = col
+            while left > 0 and line[left - 1] == color:
+                left -= 1
+            right = col
+            while right < last and line[right + 1] == color:
+                right += 1
+            if right - left >= 2:
+                matches.update((row, c) for c in range(left, right + 1))
+            top = row
+            while top > 0 and grid[top - 1][col] == color:
+                top -= 1
+            bottom = row
+            while bottom < last and grid[bottom + 1][col] == color:
+                bottom += 1
+            if bottom - top >= 2:
+                matches.update((r, col) for r in range(top, bottom + 1))
+        for col, bottom in self._dirty_cols.items():
+            _column_matches(grid, last, col, bottom, matches)
+        self._dirty_cols.clear()
+        self.dirty_cells = set(matches)
+        self._matches = matches
+        return list(matches)
+
+    def remove_matches(self):
+        # 移除所有匹配的方块并更新分数
+        matches = self.find_matches()
+        if not matches:
+            return False
+
+        if self.log is not None:
+            self.log.append((EVENT_REMOVE, self.level, matches))
+
+        # 更新分数
+        self.score += len(matches) * SCORE_PER_TILE
+
+        # 检查是否达到通关条件
+        if self.target_score is not None and self.score >= self.target_score:
+            self.victory = True
+            # 通关后停止倒计时
+            self.paused = True
+            self.paused_remaining_time = 0  # 通关后剩余时间为0
+
+        self.clear_cells(matches)
+        return True
+
+    def clear_cells(self, cells):
+        # 移除方块（设置为-1表示空），等待 fill_empty_cells 填充
+        grid = self.grid
+        for row, col in cells:
+            grid[row][col] = EMPTY
+            self.mark_cell(row, col)
+            if self._hole_cols.get(col, -1) < row:
+                self._hole_cols[col] = row
+
+    def fill_empty_cells(self):
+        # 让上方的方块下落填补空格，只处理含有空格的列
+        grid = self.grid
+        size = self.grid_size
+        log = self.log
+        level = self.level
+        random_color = self.random_color
+        dirty_cols = self._dirty_cols
+        touched_cols = self._touched_cols
+        for col in sorted(self._hole_cols):
+            # 最低空格以下的方块不受影响；以上的部分整体压实，再在顶部补上新方块
+            bottom = self._hole_cols[col]
+            column = [grid[row][col] for row in range(bottom + 1)]
+            kept = [color for color in column if color >= 0]
+            holes = bottom + 1 - len(kept)
+            if not holes:
+                continue
+            if log is not None:
+                # 下落事件从下往上记录，回放时按顺序移动不会覆盖还没移动的方块
+                to_row = bottom
+                for row in range(bottom, -1, -1):
+                    if column[row] >= 0:
+                        if row != to_row:
+                            log.append((EVENT_FALL, level, row, col, to_row))
+                        to_row -= 1
+            spawned = [random_color() for _ in range(holes)]
+            if log is not None:
+                for row, color in enumerate(spawned):
+                    log.append((EVENT_SPAWN, level, row, col, color))
+            for row, color in enumerate(spawned + kept):
+                grid[row][col] = color
+
+            # 最低空格以上的整段列都发生了变化
+            if dirty_cols.get(col, -1) < bottom:
+                dirty_cols[col] = bottom
+            if touched_cols.get(col, -1) < bottom:
+                touched_cols[col] = bottom
+        self._hole_cols.clear()
+        self._matches = None
+
+
+def _column_matches(grid, last, col, bottom, matches):
+    # 把列 col 中 0..bottom 行（整段变化的部分）所在的连线加入 matches
+    left_col = col - 1
+    right_col = col + 1
+    for row in range(bottom + 1):
+        line = grid[row]
+        color = line[col]
+        if color < 0:
+            continue
+        # 大多数格子左右都不同色，先比较相邻格子再延伸
+        if (col > 0 and line[left_col] == color) or (col < last and line[right_col] == color):
+            left = col
+            while left > 0 and line[left - 1] == color:
+                left -= 1
+            right = col
+            while right < last and line[right + 1] == color:
+                right += 1
+            if right - left >= 2:
+                matches.update((row, c) for c in range(left, right + 1))
+    # 竖直连线可能延伸到 bottom 以下
+    end = bottom
+    while end < last and grid[end + 1][col] == grid[end][col]:
+        end += 1
+    start = 0
+    color = grid[0][col]
+    for row in range(1, end + 2):
+        current = grid[row][col] if row <= end else None
+        if current != color:
+            if color >= 0 and row - start >= 3:
+                matches.update((r, col) for r in range(start, row))
+            start = row
+            color = current
+
+
+def match_free_grid(size, num_colors, rng):
+    # 按行优先逐格填色，每格只避开会和左边两格或上边两格连成三连的颜色
+    # 最多排除两种颜色，因此至少需要 3 种颜色；结果只由 rng 决定
+    if num_colors < 3:
+        raise ValueError("生成没有三连的棋盘至少需要 3 种颜色")
+    if size < 3:
+        raise ValueError("棋盘至少需要 3x3")
+    randrange = rng.randrange
+    grid = []
+    above1 = above2 = None
+    for row in range(size):
+        line = []
+        for col in range(size):
+            left = line[col - 1] if col >= 2 and line[col - 1] == line[col - 2] else -1
+            up = above1[col] if row >= 2 and above1[col] == above2[col] else -1
+            if left < 0 and up < 0:
+                color = randrange(num_colors)
+            elif left < 0 or up < 0 or left == up:
+                # 只有一种颜色被排除，跳过它
+                color = randrange(num_colors - 1)
+                if color >= max(left, up):
+                    color += 1
+            else:
+                low, high = (left, up) if left < up else (up, left)
+                color = randrange(num_colors - 2)
+                if color >= low:
+                    color += 1
+                if color >= high:
+                    color += 1
+            line.append(color)
+        grid.append(line)
+        above2, above1 = above1, line
+    return grid
+
+
+SHARED_CELLS_MAX = 64
+_shared_cells = {}
+
+
+def shared_cells(size):
+    # 棋盘大小 -> 格子坐标元组表，同样大小的所有引擎的合法交换索引引用同一组元组
+    # 服务器上每个会话因此少存两个元组/交换；大棋盘通常只有一局，不建表
+    if size > SHARED_CELLS_MAX:
+        return None
+    table = _shared_cells.get(size)
+    if table is None:
+        table = _shared_cells[size] = [[(row, col) for col in range(size)] for row in range(size)]
+    return table
+
+
+class MoveIndex:
+    # 合法交换索引：记录所有能形成匹配的相邻交换及其直接消除的方块数
+    # 键为 (pos1, pos2)，pos1 在 pos2 的左边或上边
+    __slots__ = ("engine", "moves", "stale", "cells")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.moves = {}
+        self.stale = True  # 为 True 时下次更新重建整个索引
+        self.cells = None  # 键中引用的共享格子坐标表（见 shared_cells）
+
+    def __len__(self):
+        self.engine.sync_moves()
+        return len(self.moves)
+
+    def __iter__(self):
+        self.engine.sync_moves()
+        return iter(self.moves)
+
+    @staticmethod
+    def key(pos1, pos2):
+        return (pos1, pos2) if pos1 < pos2 else (pos2, pos1)
+
+    def best_move(self):
+        # 消除数最多的交换，平分时取排序最靠前的；一次遍历，不排序整个索引
+        moves = self.moves
+        if not moves:
+            return None
+        return min(moves, key=lambda move: (-moves[move], move))
+
+    def rebuild(self):
+        size = self.engine.grid_size
+        self.moves = {}
+        self.cells = shared_cells(size)
+        for row in range(size):
+            for col in range(size):
+                self._check(row, col, row, col + 1)
+                self._check(row, col, row + 1, col)
+        self.stale = False
+
+    def update(self, cells, cols=None):
+        # 交换是否合法只取决于两个格子周围两格以内的方块，
+        # 因此只需重新检查变化格子附近的交换
+        # cols 是整段变化的列：列 -> 最低的变化行，该行及以上都发生了变化
+        size = self.engine.grid_size
+        self.cells = shared_cells(size)
+        cols = cols or {}
+        if self.stale or (len(cells) + sum(cols.values()) + len(cols)) * 4 > size * size:
+            self.rebuild()
+            return
+        # 下落产生的变化是整段的列，按列合并受影响的行，避免逐格展开
+        rows_by_col = {}
+        for row, col in cells:
+            rows_by_col.setdefault(col, set()).add(row)
+        anchors = {}
+        for col, rows in rows_by_col.items():
+            near = set()
+            for row in rows:
+                near.update(range(max(0, row - 3), min(size, row + 3)))
+            for c in range(max(0, col - 3), min(size, col + 3)):
+                anchors.setdefault(c, set()).update(near)
+        for col, bottom in cols.items():
+            near = range(min(size, bottom + 3))
+            for c in range(max(0, col - 3), min(size, col + 3)):
+                anchors.setdefault(c, set()).update(near)
+        check = self._check
+        for col, rows in anchors.items():
+            for row in rows:
+                check(row, col, row, col + 1)
+                check(row, col, row + 1, col)
+
+    def count(self, row1, col1, row2, col2):
+        # 交换 (row1, col1) 和右边或下边的 (row2, col2) 直接消除的方块数，不合法时为 0
+        grid = self.engine.grid
+        first = grid[row1][col1]
+        second = grid[row2][col2]
+        if first == second or first < 0 or second < 0:
+            return 0
+        size = self.engine.grid_size
+        # 临时交换，只检查经过这两个格子的连线
+        grid[row1][col1], grid[row2][col2] = second, first
+        # 交换后两格颜色不同，经过它们的连线互不重叠，格子数可以直接相加
+        matched = _match_count(grid, size, row1, col1) + _match_count(grid, size, row2, col2)
+        grid[row1][col1], grid[row2][col2] = first, second
+        return matched
+
+    def _check(self, row1, col1, row2, col2):
+        size = self.engine.grid_size
+        if row2 >= size or col2 >= size:
+            return
+        cells = self.cells
+        key = (cells[row1][col1], cells[row2][col2]) if cells is not None else ((row1, col1), (row2, col2))
+        matched = self.count(row1, col1, row2, col2)
+        if matched:
+            self.moves[key] = matched
+        else:
+            self.moves.pop(key, None)
+
+
+def _match_count(grid, size, row, col):
+    # 返回经过 (row, col) 的长度 >= 3 的水平和垂直连线上的格子数（交叉格只算一次）
+    line = grid[row]
+    color = line[col]
+    left = col
+    while left > 0 and line[left - 1] == color:
+        left -= 1
+    right = col
+    while right < size - 1 and line[right + 1] == color:
+        right += 1
+    top = row
+    while top > 0 and grid[top - 1][col] == color:
+        top -= 1
+    bottom = row
+    while bottom < size - 1 and grid[bottom + 1][col] == color:
+        bottom += 1
+    horizontal = right - left + 1
+    vertical = bottom - top + 1
+    if horizontal >= 3:
+        return horizontal + vertical - 1 if vertical >= 3 else horizontal
+    return vertical if vertical >= 3 else 0
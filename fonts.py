@@ -0,0 +1,61 @@
+import json
+import os
+
+import pygame
+
+# 字体加载：按名字查找系统字体在 Linux 上要扫描全部已安装的字体，是启动最慢的一步
+# 第一次启动时查找一次，把字体文件路径写入磁盘缓存，之后的启动直接按路径加载
+# 找不到中文字体的结果也会缓存；安装新字体后删除缓存文件即可重新查找
+
+FONT_NAMES = ["SimHei", "WenQuanYi Micro Hei", "Heiti TC"]
+CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "xxl",
+    "fonts.json",
+)
+
+
+def _read_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _write_cache(path, cache):
+    # 缓存写不进去（只读目录等）不影响游戏，下次启动重新查找即可
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+    except OSError:
+        pass
+
+
+def resolve_font_path(names=FONT_NAMES, cache_path=CACHE_PATH):
+    # 返回字体文件路径，没有可用的字体时返回 None（使用 pygame 默认字体）
+    key = ",".join(names)
+    cache = _read_cache(cache_path)
+    if key in cache:
+        path = cache[key]
+        if path is None or os.path.exists(path):
+            return path
+    path = pygame.font.match_font(names)
+    cache[key] = path
+    _write_cache(cache_path, cache)
+    return path
+
+
+def load_fonts(sizes, names=FONT_NAMES, cache_path=CACHE_PATH):
+    # 每个字号按路径加载一次，返回 {字号: Font}
+    path = resolve_font_path(names, cache_path)
+    if path is not None:
+        try:
+            return {size: pygame.font.Font(path, size) for size in sizes}
+        except (OSError, pygame.error):
+            pass
+    # 如果找不到中文字体，使用默认字体
+    print("警告: 无法加载中文字体，将使用默认字体")
+    return {size: pygame.font.Font(None, size) for size in sizes}
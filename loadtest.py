@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import random
+import subprocess
+import sys
+import time
+
+from bitboard import BitBoard
+from engine import GRID_SIZE, COLORS
+from profiler import percentile
+from server import (
+    Client, encode, parse_full, parse_delta, read_varint,
+    MSG_NEW, MSG_SWAP, MSG_RESTART, MSG_STATS, MSG_FULL, MSG_DELTA,
+    FLAG_GAME_OVER, FLAG_VICTORY,
+)
+
+# 游戏服务器压力测试：开若干连接，每个连接托管一批会话，每个会话按固定节奏走合法交换
+# 客户端在本地镜像棋盘（应用服务器发来的增量），用位棋盘找合法交换
+# 统计走棋延迟的分位数，并根据服务器在测试期间消耗的 CPU 时间换算每核能承载的会话数
+
+
+async def stats(client):
+    _, body = await client.request(encode(MSG_STATS))
+    values = []
+    pos = 1
+    for _ in range(4):
+        value, pos = read_varint(body, pos)
+        values.append(value)
+    return values  # sessions, moves, cpu_ms, maxrss_kb
+
+
+async def run_session(client, seed, args, deadline, latencies, rng):
+    _, body = await client.request(encode(MSG_NEW, seed + 1, args.size, args.colors))
+    sid, _, size, colors, _, _, _, grid = parse_full(body)
+    interval = 1 / args.rate if args.rate else 0
+    next_move = time.perf_counter() + rng.random() * interval
+    while True:
+        if interval:
+            delay = next_move - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_move += interval
+        if time.perf_counter() >= deadline:
+            return
+        moves = BitBoard.from_grid(grid, colors).legal_moves()
+        pos1, pos2 = rng.choice(moves)
+        began = time.perf_counter()
+        kind, body = await client.request(encode(MSG_SWAP, sid, *pos1, *pos2), sid)
+        latencies.append(time.perf_counter() - began)
+        if kind != MSG_DELTA:
+            return
+        _, flags, _, _, cells = parse_delta(body)
+        for row, col, color in cells:
+            grid[row][col] = color
+        if flags & (FLAG_GAME_OVER | FLAG_VICTORY) or sid in client.expired:
+            client.expired.discard(sid)
+            kind, body = await client.request(encode(MSG_RESTART, sid), sid)
+            if kind != MSG_FULL:
+                return
+            grid = parse_full(body)[7]
+
+
+async def load_test(args):
+    connect = dict(host=args.host, port=args.port, path=args.unix)
+    clients = [await Client.connect(**connect) for _ in range(args.connections)]
+    before = await stats(clients[0])
+    rng = random.Random(args.seed)
+    latencies = []
+    began = time.perf_counter()
+    deadline = began + args.duration
+    await asyncio.gather(*(
+        run_session(clients[i % len(clients)], args.seed * 1000003 + i, args, deadline, latencies,
+                    random.Random(rng.getrandbits(64)))
+        for i in range(args.sessions)
+    ))
+    wall = time.perf_counter() - began
+    after = await stats(clients[0])
+    for client in clients:
+        await client.close()
+    return before, after, wall, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="游戏服务器压力测试")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="通过 Unix 套接字连接")
+    parser.add_argument("--spawn", action="store_true", help="在子进程中启动服务器，测试结束后关闭")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0.5, help="每个会话每秒走几步，0 表示尽快走")
+    parser.add_argument("--duration", type=float, default=10.0, help="测试时长（秒）")
+    parser.add_argument("--size", type=int, default=GRID_SIZE)
+    parser.add_argument("--colors", type=int, default=len(COLORS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        command = [sys.executable, "server.py", "--host", args.host, "--port", str(args.port)]
+        if args.unix:
+            command += ["--unix", args.unix]
+        server = subprocess.Popen(command, stdout=subprocess.PIPE)
+        server.stdout.readline()  # 等待服务器打印启动信息
+    try:
+        before, after, wall, latencies = asyncio.run(load_test(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    moves = after[1] - before[1]
+    cpu = (after[2] - before[2]) / 1000
+    latencies.sort()
+    print(f"{args.sessions} 个会话, {args.connections} 个连接, {len(latencies)} 次交换（{moves} 次合法）, 用时 {wall:.1f} 秒")
+    print(f"延迟 p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"服务器 CPU {cpu:.2f} 秒, 每秒 {len(latencies) / wall:.0f} 次交换, 最大内存 {after[3] / 1024:.1f} MB")
+    if cpu > 0:
+        per_core = args.sessions * wall / cpu
+        print(f"每核可承载约 {per_core:.0f} 个会话" + (f"（每会话每秒 {args.rate} 步）" if args.rate else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import json
+import time
+from collections import deque
+
+# 帧分析器：记录每帧各阶段的耗时和计数器，维护滚动窗口内的 p50/p95/p99，
+# 并可以把每个阶段记录成 Chrome trace 格式（chrome://tracing、Perfetto 可直接打开）
+# 关闭时 section() 返回一个空操作的上下文，开销可以忽略
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class _Section:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+class FrameProfiler:
+    def __init__(self, window=600, max_trace_events=200000):
+        self.enabled = False
+        self.window = window
+        self.samples = {}  # 阶段名 -> 最近 window 帧的耗时（秒）
+        self.counters = {}  # 计数器名 -> 最近 window 帧的数值
+        self.frame_times = {}
+        self.frame_counts = {}
+        self.frame_start = None
+        self.frames = 0
+        self.tracing = False
+        self.trace = deque(maxlen=max_trace_events)
+        self.origin = time.perf_counter()
+
+    def section(self, name):
+        # 用法：with profiler.section("draw.board"): ...
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    def add(self, name, start, end):
+        self.frame_times[name] = self.frame_times.get(name, 0.0) + end - start
+        if self.tracing:
+            self.trace.append((name, start, end))
+
+    def count(self, name, value):
+        if self.enabled:
+            self.frame_counts[name] = self.frame_counts.get(name, 0) + value
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        self.add("frame", self.frame_start, time.perf_counter())
+        for store, values in ((self.samples, self.frame_times), (self.counters, self.frame_counts)):
+            # 本帧没有出现的阶段记为 0，保证各阶段的样本按帧对齐
+            for name in store:
+                if name not in values:
+                    store[name].append(0)
+            for name, value in values.items():
+                series = store.get(name)
+                if series is None:
+                    series = store[name] = deque(maxlen=self.window)
+                series.append(value)
+            values.clear()
+        self.frames += 1
+        self.frame_start = None
+
+    def report(self):
+        # 返回 {阶段名: (p50, p95, p99)}，单位为毫秒；计数器返回原始数值的分位数
+        result = {}
+        for name, series in self.samples.items():
+            ordered = sorted(series)
+            result[name] = tuple(percentile(ordered, f) * 1000 for f in (0.5, 0.95, 0.99))
+        counters = {}
+        for name, series in self.counters.items():
+            ordered = sorted(series)
+            counters[name] = tuple(percentile(ordered, f) for f in (0.5, 0.95, 0.99))
+        return result, counters
+
+    def dump_trace(self, path):
+        # 写出 Chrome trace 格式的 JSON，时间单位为微秒
+        origin = self.origin
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 0,
+                "tid": 0,
+            }
+            for name, start, end in self.trace
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
@@ -0,0 +1,203 @@
+import argparse
+import math
+import struct
+import sys
+import time
+import zlib
+
+from engine import Engine
+
+# 紧凑的二进制录像格式：
+#   文件头  b"XXLR" + 版本号(1 字节) + 种子、棋盘大小、颜色数（均为变长整数）
+#   事件    类型(1 字节) + 距上一事件的微秒数（变长整数）+ 参数
+#           交换事件的参数是 row1, col1, row2, col2 四个变长整数
+#   结尾    END 事件，参数为最终分数（变长整数）和最终棋盘的 CRC32（4 字节）
+# 回放时用录像里的时间驱动一个假时钟，在无界面模式下以最快速度重放整局游戏
+# 时间戳取整的方向保证回放的剩余时间不少于实际游戏：交换和暂停向下取整，
+# 恢复和重新开始（决定新的结束时间）向上取整，实际游戏中接受的交换回放时一定也被接受
+
+MAGIC = b"XXLR"
+VERSION = 3  # 2: 棋盘改为一遍构造生成，同一种子得到的初始棋盘与版本 1 不同；3: 时间单位由毫秒改为微秒
+TICKS = {2: 1000, 3: 1000000}  # 各版本每秒的时间单位数
+
+EVENT_END = 0
+EVENT_SWAP = 1
+EVENT_PAUSE = 2
+EVENT_RESUME = 3
+EVENT_RESTART = 4
+
+
+class ReplayError(ValueError):
+    pass
+
+
+class ReplayMismatch(ReplayError):
+    pass
+
+
+def write_varint(buf, value):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError("录像数据被截断")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def grid_checksum(grid):
+    return zlib.crc32(bytes(color & 0xFF for line in grid for color in line))
+
+
+class ReplayClock:
+    # 回放用的假时钟，时间由录像中的事件推进
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder:
+    # 记录一局游戏：时间以引擎创建时的 start_time 为起点
+    def __init__(self, engine, path=None):
+        if engine.seed is None:
+            raise ReplayError("引擎使用了外部注入的随机数生成器，无法录像")
+        self.engine = engine
+        self.path = path
+        self.base = engine.start_time
+        self.last_tick = 0
+        self.buf = bytearray(MAGIC)
+        self.buf.append(VERSION)
+        write_varint(self.buf, engine.seed)
+        write_varint(self.buf, engine.grid_size)
+        write_varint(self.buf, engine.num_colors)
+
+    def _now(self, up=False):
+        ticks = (self.engine.clock() - self.base) * TICKS[VERSION]
+        return math.ceil(ticks) if up else math.floor(ticks)
+
+    def _event(self, kind, up=False):
+        delta = max(0, self._now(up) - self.last_tick)
+        self.last_tick += delta
+        self.buf.append(kind)
+        write_varint(self.buf, delta)
+
+    def record_swap(self, pos1, pos2):
+        self._event(EVENT_SWAP)
+        for value in (*pos1, *pos2):
+            write_varint(self.buf, value)
+
+    def record_pause(self):
+        self._event(EVENT_PAUSE)
+
+    def record_resume(self):
+        self._event(EVENT_RESUME, up=True)
+
+    def record_restart(self):
+        self._event(EVENT_RESTART, up=True)
+
+    def finish(self):
+        # 追加结尾事件，返回完整的录像数据；未结算完的连锁先结算，结尾的分数与回放一致
+        self.engine.finish_move()
+        data = bytearray(self.buf)
+        data.append(EVENT_END)
+        write_varint(data, max(0, self._now() - self.last_tick))
+        write_varint(data, self.engine.score)
+        data += struct.pack("<I", grid_checksum(self.engine.grid))
+        return bytes(data)
+
+    def save(self, path=None):
+        with open(path or self.path, "wb") as f:
+            f.write(self.finish())
+
+
+def play(data, verify=True):
+    # 以最快速度重放录像，返回 (引擎, 事件数)；verify 为 True 时校验最终分数和棋盘
+    if data[:4] != MAGIC:
+        raise ReplayError("不是录像文件")
+    if data[4] not in TICKS:
+        raise ReplayError(f"不支持的录像版本: {data[4]}")
+    ticks = TICKS[data[4]]
+    seed, pos = read_varint(data, 5)
+    grid_size, pos = read_varint(data, pos)
+    num_colors, pos = read_varint(data, pos)
+
+    clock = ReplayClock()
+    engine = Engine(grid_size, num_colors, clock=clock, seed=seed)
+    now = 0
+    events = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError("录像缺少结尾事件")
+        kind = data[pos]
+        delta, pos = read_varint(data, pos + 1)
+        now += delta
+        clock.now = now / ticks
+        engine.update_timer()
+
+        if kind == EVENT_SWAP:
+            coords = []
+            for _ in range(4):
+                value, pos = read_varint(data, pos)
+                coords.append(value)
+            engine.apply_move((coords[0], coords[1]), (coords[2], coords[3]), record=False)
+        elif kind == EVENT_PAUSE:
+            if not engine.paused:
+                engine.toggle_pause()
+        elif kind == EVENT_RESUME:
+            if engine.paused:
+                engine.toggle_pause()
+        elif kind == EVENT_RESTART:
+            engine.restart()
+        elif kind == EVENT_END:
+            score, pos = read_varint(data, pos)
+            (checksum,) = struct.unpack_from("<I", data, pos)
+            if verify:
+                if engine.score != score:
+                    raise ReplayMismatch(f"最终分数不一致: 录像 {score}, 回放 {engine.score}")
+                if grid_checksum(engine.grid) != checksum:
+                    raise ReplayMismatch("最终棋盘不一致")
+            return engine, events
+        else:
+            raise ReplayError(f"未知的事件类型: {kind}")
+        events += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以最快速度重放录像并校验结果")
+    parser.add_argument("files", nargs="+", help="录像文件")
+    args = parser.parse_args()
+
+    failed = 0
+    total_events = 0
+    began = time.perf_counter()
+    for path in args.files:
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            engine, events = play(data)
+        except ReplayError as e:
+            failed += 1
+            print(f"{path}: 失败 - {e}")
+            continue
+        total_events += events
+        print(f"{path}: 通过 - {events} 个事件, 分数 {engine.score}")
+    elapsed = time.perf_counter() - began
+    print(f"共 {len(args.files)} 个录像, {failed} 个失败, {total_events} 个事件, 用时 {elapsed:.3f} 秒")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+import argparse
+import asyncio
+import os
+import resource
+import struct
+import sys
+import time
+
+from engine import Engine, EVENT_SWAP, EVENT_REMOVE, EVENT_FALL, EVENT_SPAWN, EVENT_SHUFFLE
+from replay import ReplayError, write_varint, read_varint
+import snapshot
+from snapshot import pack_grid
+
+# 单进程 asyncio 游戏服务器：在一个事件循环里托管大量互相独立的无界面对局，
+# 用于排行榜校验和瘦客户端。规则完全由 Engine 执行，服务器不依赖 pygame
+#
+# 协议：每条消息是 4 字节小端长度 + 消息体，消息体是类型(1 字节) + 变长整数参数
+#   请求  NEW seed+1(0 表示随机) size colors       -> FULL
+#         SWAP sid row1 col1 row2 col2             -> DELTA
+#         PAUSE sid（切换暂停）                     -> DELTA
+#         RESTART sid                              -> FULL
+#         STATE sid                                -> FULL
+#         CLOSE sid                                -> CLOSED
+#         STATS                                    -> STATS_REPLY
+#         SUSPEND sid（挂起并关闭会话）              -> SNAPSHOT
+#         RESUME + 快照字节（用快照创建新会话）      -> FULL
+#   回复  FULL sid seed size colors flags score remaining_ms + size*size 字节的棋盘
+#         DELTA sid flags score remaining_ms count + count 组 (row col color)，只包含变化的格子
+#         EXPIRED sid score（时间到时服务器主动推送）
+#         CLOSED sid / ERROR sid code
+#         STATS_REPLY sessions moves cpu_ms maxrss_kb
+#         SNAPSHOT sid + 快照字节（snapshot.py 格式，包含随机数状态，恢复后继续生成相同的方块）
+#                  + 一次性编号(16 字节) + 服务器密钥的 HMAC；RESUME 时校验，客户端无法伪造分数、时间或棋盘
+#                  每个快照只能恢复一次，并且只在挂起它的服务器进程里有效：同一局不能复制成多个会话反复试走
+# 倒计时到期用事件循环的定时器调度，不需要每帧轮询所有会话
+
+MSG_NEW = 1
+MSG_SWAP = 2
+MSG_PAUSE = 3
+MSG_RESTART = 4
+MSG_STATE = 5
+MSG_CLOSE = 6
+MSG_STATS = 7
+MSG_SUSPEND = 8
+MSG_RESUME = 9
+
+MSG_FULL = 0x81
+MSG_DELTA = 0x82
+MSG_EXPIRED = 0x83
+MSG_CLOSED = 0x84
+MSG_STATS_REPLY = 0x85
+MSG_SNAPSHOT = 0x86
+MSG_ERROR = 0x8F
+
+FLAG_ACCEPTED = 1  # 交换合法并已执行
+FLAG_PAUSED = 2
+FLAG_GAME_OVER = 4
+FLAG_VICTORY = 8
+
+ERROR_UNKNOWN_SESSION = 1
+ERROR_BAD_MESSAGE = 2
+ERROR_BAD_PARAMS = 3
+
+HEADER = struct.Struct("<I")
+MAX_MESSAGE = 1 << 20
+# 所有会话共用一个事件循环，单个请求的耗时就是其他会话的额外延迟：
+# 64x64 建局约 20 ms、一次交换最多约 5 ms；512x512 建局超过 1 秒，一次交换可达 1 秒以上
+MAX_GRID_SIZE = 64
+MAX_COLORS = 127  # 棋盘按有符号字节打包（snapshot.pack_grid，空格为 -1）
+NONCE_SIZE = 16  # 挂起快照的一次性编号
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode(kind, *values, payload=b""):
+    body = bytearray((kind,))
+    for value in values:
+        write_varint(body, value)
+    body += payload
+    return HEADER.pack(len(body)) + body
+
+
+def decode(body):
+    # 解析只含变长整数参数的消息（除 RESUME 外的请求都是这种格式），返回 (类型, 参数列表)
+    if not body:
+        raise ProtocolError("空消息")
+    values = []
+    pos = 1
+    try:
+        while pos < len(body):
+            value, pos = read_varint(body, pos)
+            values.append(value)
+    except ReplayError as e:
+        raise ProtocolError(str(e)) from None
+    return body[0], values
+
+
+async def read_message(reader):
+    header = await reader.readexactly(HEADER.size)
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE:
+        raise ProtocolError(f"消息过长: {length}")
+    return await reader.readexactly(length)
+
+
+def request_sid(body):
+    # 出错请求的会话编号（解析不出来时为 0），客户端按它把错误回复交给等待这个会话的请求
+    if len(body) > 1 and body[0] not in (MSG_NEW, MSG_STATS, MSG_RESUME):
+        try:
+            return read_varint(body, 1)[0]
+        except ReplayError:
+            pass
+    return 0
+
+
+def state_flags(engine):
+    flags = 0
+    if engine.paused:
+        flags |= FLAG_PAUSED
+    if engine.game_over:
+        flags |= FLAG_GAME_OVER
+    if engine.victory:
+        flags |= FLAG_VICTORY
+    return flags
+
+
+def remaining_ms(engine):
+    return round(engine.get_remaining_time() * 1000)
+
+
+def changed_cells(log, size):
+    # 从事件日志中收集一次交换改变过的格子，洗牌时整个棋盘都算变化
+    cells = set()
+    for event in log:
+        kind = event[0]
+        if kind == EVENT_SWAP:
+            cells.add(event[1])
+            cells.add(event[2])
+        elif kind == EVENT_REMOVE:
+            cells.update(event[2])
+        elif kind == EVENT_FALL:
+            cells.add((event[2], event[3]))
+            cells.add((event[4], event[3]))
+        elif kind == EVENT_SPAWN:
+            cells.add((event[2], event[3]))
+        elif kind == EVENT_SHUFFLE:
+            return [(row, col) for row in range(size) for col in range(size)]
+    return sorted(cells)
+
+
+class Session:
+    # 每个会话只保存引擎、倒计时定时器和所属连接
+    __slots__ = ("sid", "engine", "timer", "writer")
+
+    def __init__(self, sid, engine, writer):
+        self.sid = sid
+        self.engine = engine
+        self.timer = None
+        self.writer = writer
+
+
+class GameServer:
+    def __init__(self, key=None):
+        # key 用于签名挂起的快照，不指定时随机生成
+        # suspended 是尚未恢复的快照的一次性编号，恢复时取走，同一个快照不能恢复第二次
+        self.key = key if key is not None else os.urandom(32)
+        self.suspended = set()
+        self.sessions = {}
+        self.next_sid = 1
+        self.moves = 0
+        self.loop = None
+
+    async def start(self, host=None, port=None, path=None):
+        self.loop = asyncio.get_running_loop()
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    # 倒计时：每个会话在结束时间挂一个定时器，暂停、通关或结束时取消
+    def schedule(self, session):
+        if session.timer is not None:
+            session.timer.cancel()
+            session.timer = None
+        engine = session.engine
+        if not engine.paused and not engine.game_over and not engine.victory:
+            session.timer = self.loop.call_at(engine.end_time, self.expire, session)
+
+    def expire(self, session):
+        session.timer = None
+        engine = session.engine
+        engine.update_timer()
+        if not engine.game_over:
+            # 定时器比结束时间早触发了一点，重新挂上
+            self.schedule(session)
+            return
+        if not session.writer.is_closing():
+            session.writer.write(encode(MSG_EXPIRED, session.sid, engine.score))
+
+    def full_state(self, session):
+        engine = session.engine
+        return encode(
+            MSG_FULL, session.sid, engine.seed, engine.grid_size, engine.num_colors,
+            state_flags(engine), engine.score, remaining_ms(engine), payload=pack_grid(engine.grid),
+        )
+
+    def delta(self, session, flags, cells):
+        engine = session.engine
+        body = bytearray()
+        grid = engine.grid
+        for row, col in cells:
+            write_varint(body, row)
+            write_varint(body, col)
+            body.append(grid[row][col] & 0xFF)
+        return encode(
+            MSG_DELTA, session.sid, flags | state_flags(engine), engine.score, remaining_ms(engine), len(cells),
+            payload=body,
+        )
+
+    def add_session(self, engine, writer):
+        session = Session(self.next_sid, engine, writer)
+        self.next_sid += 1
+        self.sessions[session.sid] = session
+        self.schedule(session)
+        return self.full_state(session)
+
+    def close_session(self, session):
+        if session.timer is not None:
+            session.timer.cancel()
+        self.sessions.pop(session.sid, None)
+
+    def dispatch(self, body, writer):
+        # 处理一条请求，返回回复消息
+        if body and body[0] == MSG_RESUME:
+            # RESUME 的参数是签过名的快照，直接从快照创建引擎，不重新生成棋盘
+            # 快照来自客户端：先校验签名和大小，再按不可信数据恢复（检查棋盘、重建合法交换索引）
+            try:
+                data = snapshot.verify(body[1:], self.key)
+                data, nonce = data[:-NONCE_SIZE], data[-NONCE_SIZE:]
+                if nonce not in self.suspended:
+                    return encode(MSG_ERROR, 0, ERROR_BAD_PARAMS)
+                _, size, colors, *_ = snapshot.read_header(data)
+                if not 3 <= size <= MAX_GRID_SIZE or not 3 <= colors <= MAX_COLORS:
+                    return encode(MSG_ERROR, 0, ERROR_BAD_PARAMS)
+                engine = snapshot.load(data, clock=self.loop.time, trusted=False)
+            except snapshot.SnapshotError:
+                return encode(MSG_ERROR, 0, ERROR_BAD_PARAMS)
+            self.suspended.discard(nonce)
+            return self.add_session(engine, writer)
+        kind, values = decode(body)
+        if kind == MSG_NEW:
+            if len(values) != 3:
+                raise ProtocolError("NEW 参数个数错误")
+            seed, size, colors = values
+            if not 3 <= size <= MAX_GRID_SIZE or not 3 <= colors <= MAX_COLORS:
+                return encode(MSG_ERROR, 0, ERROR_BAD_PARAMS)
+            engine = Engine(size, colors, clock=self.loop.time, seed=seed - 1 if seed else None)
+            return self.add_session(engine, writer)
+        if kind == MSG_STATS:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            return encode(MSG_STATS_REPLY, len(self.sessions), self.moves,
+                          round(time.process_time() * 1000), usage.ru_maxrss)
+
+        if not values:
+            raise ProtocolError("缺少会话编号")
+        sid = values[0]
+        session = self.sessions.get(sid)
+        if session is None:
+            return encode(MSG_ERROR, sid, ERROR_UNKNOWN_SESSION)
+        engine = session.engine
+        engine.update_timer()
+        if kind == MSG_SWAP:
+            if len(values) != 5:
+                raise ProtocolError("SWAP 参数个数错误")
+            row1, col1, row2, col2 = values[1:]
+            size = engine.grid_size
+            if max(row1, col1, row2, col2) >= size:
+                return encode(MSG_ERROR, sid, ERROR_BAD_PARAMS)
+            log = engine.apply_move((row1, col1), (row2, col2))
+            if log is None:
+                return self.delta(session, 0, [])
+            self.moves += 1
+            if engine.victory:
+                self.schedule(session)
+            return self.delta(session, FLAG_ACCEPTED, changed_cells(log, size))
+        if kind == MSG_PAUSE:
+            if not engine.game_over and not engine.victory:
+                engine.toggle_pause()
+                self.schedule(session)
+            return self.delta(session, 0, [])
+        if kind == MSG_RESTART:
+            engine.restart()
+            self.schedule(session)
+            return self.full_state(session)
+        if kind == MSG_STATE:
+            return self.full_state(session)
+        if kind == MSG_CLOSE:
+            self.close_session(session)
+            return encode(MSG_CLOSED, sid)
+        if kind == MSG_SUSPEND:
+            self.close_session(session)
+            nonce = os.urandom(NONCE_SIZE)
+            self.suspended.add(nonce)
+            return encode(MSG_SNAPSHOT, sid, payload=snapshot.sign(snapshot.save(engine) + nonce, self.key))
+        raise ProtocolError(f"未知的消息类型: {kind}")
+
+    async def handle(self, reader, writer):
+        # 一个连接可以创建多个会话，连接断开时关闭它的所有会话
+        try:
+            while True:
+                body = await read_message(reader)
+                try:
+                    reply = self.dispatch(body, writer)
+                except ProtocolError:
+                    reply = encode(MSG_ERROR, request_sid(body), ERROR_BAD_MESSAGE)
+                writer.write(reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            for session in [s for s in self.sessions.values() if s.writer is writer]:
+                self.close_session(session)
+            writer.close()
+
+
+class Client:
+    # 协议客户端：每个会话同时只有一个未完成的请求，回复按会话编号分发
+    # EXPIRED 推送记录在 expired 集合里
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}  # sid -> Future，sid 为 0 的是 NEW/STATS 请求
+        self.new_queue = []
+        self.expired = set()
+        self.task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, host=None, port=None, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                body = await read_message(self.reader)
+                # 回复的第一个参数是会话编号（STATS_REPLY 除外），后面可能跟着字节负载
+                kind = body[0]
+                sid = read_varint(body, 1)[0] if len(body) > 1 else 0
+                if kind == MSG_EXPIRED:
+                    self.expired.add(sid)
+                    continue
+                if kind in (MSG_FULL, MSG_DELTA, MSG_CLOSED, MSG_SNAPSHOT, MSG_ERROR) and sid in self.waiting:
+                    future = self.waiting.pop(sid)
+                elif self.new_queue:
+                    # NEW、RESUME 和 STATS 的回复按请求顺序到达
+                    future = self.new_queue.pop(0)
+                else:
+                    continue
+                if not future.done():
+                    future.set_result((kind, body))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in list(self.waiting.values()) + self.new_queue:
+                if not future.done():
+                    future.set_exception(ConnectionError("连接已断开"))
+
+    async def request(self, message, sid=0):
+        future = asyncio.get_running_loop().create_future()
+        if sid:
+            self.waiting[sid] = future
+        else:
+            self.new_queue.append(future)
+        self.writer.write(message)
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        self.task.cancel()
+
+
+def parse_full(body):
+    # 返回 (sid, seed, size, colors, flags, score, remaining_ms, grid)
+    values = []
+    pos = 1
+    for _ in range(7):
+        value, pos = read_varint(body, pos)
+        values.append(value)
+    size = values[2]
+    data = body[pos:pos + size * size]
+    grid = [[data[row * size + col] for col in range(size)] for row in range(size)]
+    return (*values, grid)
+
+
+def parse_snapshot(body):
+    # 返回 (sid, 快照字节)，快照可以原样用 RESUME 发回服务器
+    sid, pos = read_varint(body, 1)
+    return sid, bytes(body[pos:])
+
+
+def parse_delta(body):
+    # 返回 (sid, flags, score, remaining_ms, [(row, col, color), ...])
+    values = []
+    pos = 1
+    for _ in range(5):
+        value, pos = read_varint(body, pos)
+        values.append(value)
+    cells = []
+    for _ in range(values[4]):
+        row, pos = read_varint(body, pos)
+        col, pos = read_varint(body, pos)
+        cells.append((row, col, body[pos]))
+        pos += 1
+    return values[0], values[1], values[2], values[3], cells
+
+
+def main():
+    parser = argparse.ArgumentParser(description="托管大量无界面对局的 asyncio 游戏服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="监听 Unix 套接字而不是 TCP 端口")
+    args = parser.parse_args()
+
+    async def serve():
+        server = GameServer()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+        listener = await server.start(args.host, args.port, args.unix)
+        where = args.unix or f"{args.host}:{args.port}"
+        print(f"游戏服务器已启动: {where}", flush=True)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import random
+import signal
+import sys
+import time
+from collections import Counter
+
+from bitboard import BitBoard
+from engine import Engine, GRID_SIZE, COLORS, GAME_TIME, TARGET_SCORE, EVENT_SCORE
+from replay import ReplayClock
+
+# 批量对局模拟：在多进程中无界面地玩大量对局，用来调整 TARGET_SCORE 和 GAME_TIME
+# 每局的种子只由 --seed 和对局编号决定，结果与进程数和任务分配无关
+# 工作进程按块返回直方图形式的汇总结果，主进程边收边合并，内存占用与对局数无关
+#
+# 时间模型：每步先花 --move-time 秒思考，连锁每一层再花 --level-time 秒播放动画
+# 每局一直玩到最长的游戏时间，同时记下每个 --game-times 时刻的分数，
+# 因此一次运行可以得到多个游戏时长 x 多个目标分数下的胜率
+
+DEFAULT_MOVE_TIME = 1.5
+DEFAULT_LEVEL_TIME = 0.25
+DEFAULT_CHUNK = 200  # 每个任务包含的对局数
+SCORE_BUCKET = 50  # 分数直方图的桶宽
+
+
+# 玩家策略：policy(engine, rng) 返回一个合法交换 (pos1, pos2)
+def random_policy(engine, rng):
+    return rng.choice(sorted(engine.moves))
+
+
+def greedy_policy(engine, rng):
+    # 选择直接消除方块最多的交换
+    return engine.hint()
+
+
+def lookahead_policy(engine, rng, samples=4):
+    # 在位棋盘上把每个候选交换的整个连锁结算出来（随机补充 samples 次），选平均得分最高的
+    base = BitBoard.from_engine(engine)
+    best_move = None
+    best_value = -1
+    for move in sorted(engine.moves):
+        total = 0
+        for _ in range(samples):
+            board = base.copy()
+            board.rng = random.Random(rng.getrandbits(64))
+            board.swap(*move)
+            board.settle()
+            total += board.score - base.score
+        if total > best_value:
+            best_move = move
+            best_value = total
+    return best_move
+
+
+POLICIES = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "lookahead": lookahead_policy,
+}
+
+
+def resolve_policy(name):
+    # 内置策略按名字查找，也可以用 "模块:函数" 指定自定义策略
+    if name in POLICIES:
+        return POLICIES[name]
+    if ":" in name:
+        module, func = name.split(":", 1)
+        return getattr(importlib.import_module(module), func)
+    raise ValueError(f"未知的策略: {name}")
+
+
+def game_seed(seed, index):
+    return seed * 1000003 + index
+
+
+def play_game(seed, policy, config):
+    # 玩一局，返回 (每个游戏时长时刻的分数, 每步的连锁层数列表)
+    clock = ReplayClock()
+    game_times = config["game_times"]
+    engine = Engine(config["size"], config["colors"], clock=clock, seed=seed,
+                    game_time=game_times[-1], target_score=None)
+    rng = random.Random(f"policy:{seed}")
+    move_time = config["move_time"]
+    level_time = config["level_time"]
+    scores = []
+    levels = []
+    while True:
+        clock.now += move_time
+        # 记录已经过去的游戏时长时刻的分数
+        while len(scores) < len(game_times) and clock.now >= game_times[len(scores)]:
+            scores.append(engine.score)
+        engine.update_timer()
+        if engine.game_over:
+            break
+        log = engine.apply_move(*policy(engine, rng), record=False)
+        depth = sum(1 for event in log if event[0] == EVENT_SCORE)
+        levels.append(depth)
+        clock.now += depth * level_time
+    while len(scores) < len(game_times):
+        scores.append(engine.score)
+    return scores, levels
+
+
+def run_chunk(task):
+    # 工作进程：玩 [start, start + count) 编号的对局，返回汇总结果
+    start, count, config = task
+    policy = resolve_policy(config["policy"])
+    targets = config["targets"]
+    game_times = config["game_times"]
+    result = new_summary(config)
+    began = time.process_time()
+    for index in range(start, start + count):
+        scores, levels = play_game(game_seed(config["seed"], index), policy, config)
+        for t, score in zip(game_times, scores):
+            stats = result["by_time"][t]
+            stats["scores"][score // SCORE_BUCKET * SCORE_BUCKET] += 1
+            stats["score_sum"] += score
+            for target in targets:
+                if score >= target:
+                    stats["wins"][target] += 1
+        result["cascades"].update(levels)
+        result["moves"] += len(levels)
+    result["games"] = count
+    result["cpu_time"] = time.process_time() - began
+    return result
+
+
+def new_summary(config):
+    return {
+        "games": 0,
+        "moves": 0,
+        "cpu_time": 0.0,
+        "cascades": Counter(),
+        "by_time": {
+            t: {"scores": Counter(), "score_sum": 0, "wins": Counter()} for t in config["game_times"]
+        },
+    }
+
+
+def merge(total, part):
+    total["games"] += part["games"]
+    total["moves"] += part["moves"]
+    total["cpu_time"] += part["cpu_time"]
+    total["cascades"].update(part["cascades"])
+    for t, stats in part["by_time"].items():
+        into = total["by_time"][t]
+        into["scores"].update(stats["scores"])
+        into["score_sum"] += stats["score_sum"]
+        into["wins"].update(stats["wins"])
+
+
+def histogram_percentile(histogram, fraction):
+    # 直方图的分位数（桶的下界）
+    total = sum(histogram.values())
+    if not total:
+        return 0
+    rank = fraction * (total - 1)
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen > rank:
+            return value
+    return max(histogram)
+
+
+def tasks(config, games, chunk):
+    for start in range(0, games, chunk):
+        yield start, min(chunk, games - start), config
+
+
+def init_worker():
+    # 在初始化过 pygame 的进程里调用时，工作进程会继承 SDL 的 SIGTERM 处理函数，
+    # 退出 with 块时 terminate() 杀不掉它们；恢复默认处理
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def simulate(config, games, workers=None, chunk=DEFAULT_CHUNK, progress=None):
+    # 在进程池中模拟 games 局，progress(summary) 在每收到一块结果后调用
+    summary = new_summary(config)
+    if workers == 1:
+        results = map(run_chunk, tasks(config, games, chunk))
+        for part in results:
+            merge(summary, part)
+            if progress:
+                progress(summary)
+        return summary
+    with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+        for part in pool.imap_unordered(run_chunk, tasks(config, games, chunk)):
+            merge(summary, part)
+            if progress:
+                progress(summary)
+    return summary
+
+
+def report(summary, config, wall_time, workers):
+    games = summary["games"]
+    result = {
+        "config": dict(config),
+        "games": games,
+        "moves": summary["moves"],
+        "workers": workers,
+        "wall_time": wall_time,
+        "moves_per_sec": summary["moves"] / wall_time if wall_time else 0.0,
+        "moves_per_sec_per_core": summary["moves"] / summary["cpu_time"] if summary["cpu_time"] else 0.0,
+        "cascade_levels": {str(k): v for k, v in sorted(summary["cascades"].items())},
+        "by_time": {},
+    }
+    for t, stats in summary["by_time"].items():
+        scores = stats["scores"]
+        result["by_time"][str(t)] = {
+            "mean_score": stats["score_sum"] / games if games else 0.0,
+            "p10": histogram_percentile(scores, 0.1),
+            "p50": histogram_percentile(scores, 0.5),
+            "p90": histogram_percentile(scores, 0.9),
+            "win_rate": {str(target): stats["wins"][target] / games if games else 0.0 for target in config["targets"]},
+            "score_histogram": {str(k): v for k, v in sorted(scores.items())},
+        }
+    return result
+
+
+def print_report(result):
+    print(f"{result['games']} 局, {result['moves']} 步, 用时 {result['wall_time']:.1f} 秒, {result['workers']} 个进程")
+    print(f"每秒 {result['moves_per_sec']:.0f} 步, 每核每秒 {result['moves_per_sec_per_core']:.0f} 步")
+    total_moves = result["moves"] or 1
+    levels = ", ".join(f"{k}层 {v / total_moves:.1%}" for k, v in result["cascade_levels"].items())
+    print(f"连锁层数分布: {levels}")
+    for t, stats in result["by_time"].items():
+        rates = "  ".join(f"{target}分 {rate:.1%}" for target, rate in stats["win_rate"].items())
+        print(f"游戏时间 {t} 秒: 平均 {stats['mean_score']:.0f} 分 "
+              f"(p10 {stats['p10']}, p50 {stats['p50']}, p90 {stats['p90']}), 胜率: {rates}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程批量模拟对局，统计分数、胜率和连锁分布")
+    parser.add_argument("--games", type=int, default=10000, help="模拟的对局数")
+    parser.add_argument("--policy", default="greedy", help="玩家策略: random、greedy、lookahead 或 模块:函数")
+    parser.add_argument("--workers", type=int, help="进程数，默认使用全部 CPU")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=GRID_SIZE)
+    parser.add_argument("--colors", type=int, default=len(COLORS))
+    parser.add_argument("--game-times", type=float, nargs="+", default=[GAME_TIME], help="统计的游戏时长（秒）")
+    parser.add_argument("--targets", type=int, nargs="+", default=[TARGET_SCORE], help="统计胜率的目标分数")
+    parser.add_argument("--move-time", type=float, default=DEFAULT_MOVE_TIME, help="每步的思考时间（秒）")
+    parser.add_argument("--level-time", type=float, default=DEFAULT_LEVEL_TIME, help="每层连锁的动画时间（秒）")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="每个任务的对局数")
+    parser.add_argument("--output", "-o", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    resolve_policy(args.policy)
+    workers = args.workers or multiprocessing.cpu_count()
+    config = {
+        "policy": args.policy,
+        "seed": args.seed,
+        "size": args.size,
+        "colors": args.colors,
+        "game_times": sorted(args.game_times),
+        "targets": sorted(args.targets),
+        "move_time": args.move_time,
+        "level_time": args.level_time,
+    }
+
+    began = time.perf_counter()
+
+    def progress(summary):
+        elapsed = time.perf_counter() - began
+        print(f"\r{summary['games']}/{args.games} 局, {summary['moves'] / elapsed:.0f} 步/秒", end="", file=sys.stderr)
+
+    summary = simulate(config, args.games, workers, args.chunk, progress)
+    print(file=sys.stderr)
+    result = report(summary, config, time.perf_counter() - began, workers)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
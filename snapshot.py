@@ -0,0 +1,325 @@
+import hmac
+import math
+import random
+import struct
+from array import array
+from itertools import chain
+
+from engine import Engine, EVENT_REMOVE, EVENT_FALL, EVENT_SPAWN, EVENT_SCORE, EVENT_SHUFFLE
+from replay import ReplayError, write_varint, read_varint
+
+# 紧凑的二进制快照格式，保存一局进行中的游戏，用于挂起/恢复和廉价复制局面：
+#   文件头  HEADER：b"XXLS" + 版本号 + 标志位 + 棋盘大小、颜色数、种子、分数、
+#           剩余时间、游戏时长、目标分数、选中的格子
+#   棋盘    size*size 字节，按行排列，每格一个有符号字节（空格为 -1）
+#   交换    合法交换索引：个数(4 字节) + 每个交换的编码（4 字节，(格子编号 << 1) | 是否竖直交换）
+#           + 每个交换直接消除的方块数（1 字节）；恢复时不必重新扫描整个棋盘
+#   随机数  （可选）Mersenne Twister 的 625 个状态字 + 缓存的高斯值，恢复后后续生成的方块与原局相同
+#   前端    （可选，只有 pygame 前端的 Game 才有）显示分数、动画时间、显示棋盘、
+#           进行中的动画（定长记录）和等待回放的连锁层（事件用变长整数编码）
+# 时间保存为剩余秒数，恢复时按新的时钟重新计算结束时间
+# 快照只在两次交换之间保存，此时棋盘已经稳定（没有三连和空格）
+# 交给不可信的一方保存的快照用 sign 附加 HMAC，取回时先 verify，再以 trusted=False 恢复
+
+MAGIC = b"XXLS"
+VERSION = 1
+
+FLAG_GAME_OVER = 1
+FLAG_VICTORY = 2
+FLAG_PAUSED = 4
+FLAG_SEED = 8  # 有种子
+FLAG_TARGET = 16  # 有目标分数
+FLAG_RNG = 32  # 包含随机数生成器状态
+FLAG_SELECTED = 64  # 有选中的格子
+FLAG_FRONTEND = 128  # 包含前端状态
+
+# magic version flags size colors seed score remaining game_time target selected_row selected_col
+HEADER = struct.Struct("<4sBBHBqQddQHH")
+COUNT = struct.Struct("<I")
+RNG_STATE = struct.Struct("<625Id")
+# display_score animation_now animation_count
+FRONTEND = struct.Struct("<QdI")
+DIGEST = "sha256"
+TAG_SIZE = 32
+# row col kind dx dy start duration
+ANIMATION = struct.Struct("<HHBdddd")
+ANIMATION_KINDS = ("slide",)
+
+# 回放事件的类型编码
+EVENT_CODES = {EVENT_REMOVE: 1, EVENT_FALL: 2, EVENT_SPAWN: 3, EVENT_SCORE: 4, EVENT_SHUFFLE: 5}
+EVENT_KINDS = {code: kind for kind, code in EVENT_CODES.items()}
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def pack_grid(grid):
+    # 棋盘的紧凑字节表示（每格一个有符号字节），也用作置换表的键
+    return array("b", chain.from_iterable(grid)).tobytes()
+
+
+def unpack_grid(data, size, pos=0):
+    cells = memoryview(data)[pos:pos + size * size].cast("b")
+    if len(cells) != size * size:
+        raise SnapshotError("快照数据被截断")
+    return [cells[row * size:(row + 1) * size].tolist() for row in range(size)]
+
+
+def check_grid(grid, colors):
+    # 不可信快照的棋盘：每格都是有效颜色（没有空格），并且没有未消除的三连
+    if colors < 3:
+        raise SnapshotError(f"颜色数无效: {colors}")
+    cells = list(chain.from_iterable(grid))
+    if cells and (min(cells) < 0 or max(cells) >= colors):
+        raise SnapshotError("快照棋盘上有无效的颜色")
+    for line in chain(grid, zip(*grid)):
+        for a, b, c in zip(line, line[1:], line[2:]):
+            if a == b == c:
+                raise SnapshotError("快照棋盘上有未消除的三连")
+
+
+def pack_moves(engine):
+    engine.sync_moves()
+    size = engine.grid_size
+    codes = array("I")
+    counts = bytearray()
+    for ((row1, col1), (row2, _)), count in engine.moves.moves.items():
+        codes.append((row1 * size + col1) << 1 | (row2 != row1))
+        counts.append(count)
+    return COUNT.pack(len(counts)) + codes.tobytes() + bytes(counts)
+
+
+def unpack_moves(data, size, pos):
+    # 返回 ({交换: 消除数}, 新位置)
+    if len(data) < pos + COUNT.size:
+        raise SnapshotError("快照数据被截断")
+    (count,) = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    end = pos + count * 5
+    if len(data) < end:
+        raise SnapshotError("快照数据被截断")
+    codes = array("I")
+    codes.frombytes(data[pos:pos + count * 4])
+    moves = {}
+    for code, matched in zip(codes, data[pos + count * 4:end]):
+        row, col = divmod(code >> 1, size)
+        moves[((row, col), (row + 1, col) if code & 1 else (row, col + 1))] = matched
+    return moves, end
+
+
+def save(engine, rng=True):
+    # 保存引擎（或 pygame 前端的 Game）的完整状态，返回快照字节串
+    # rng=False 时不保存随机数状态（省下约 2.5 KB），恢复后按种子重新开始生成方块
+    size = engine.grid_size
+    flags = 0
+    if engine.game_over:
+        flags |= FLAG_GAME_OVER
+    if engine.victory:
+        flags |= FLAG_VICTORY
+    if engine.paused:
+        flags |= FLAG_PAUSED
+    if engine.seed is not None:
+        flags |= FLAG_SEED
+    if engine.target_score is not None:
+        flags |= FLAG_TARGET
+    state = engine.rng.getstate() if rng and isinstance(engine.rng, random.Random) else None
+    if state is not None and state[0] == 3:
+        flags |= FLAG_RNG
+    selected = getattr(engine, "selected", None)
+    if selected is not None:
+        flags |= FLAG_SELECTED
+    frontend = hasattr(engine, "animations")
+    if frontend:
+        flags |= FLAG_FRONTEND
+    try:
+        header = HEADER.pack(
+            MAGIC, VERSION, flags, size, engine.num_colors,
+            engine.seed if engine.seed is not None else 0, engine.score,
+            engine.get_remaining_time(), engine.game_time,
+            engine.target_score if engine.target_score is not None else 0,
+            *(selected if selected is not None else (0, 0)),
+        )
+    except struct.error as e:
+        raise SnapshotError(f"无法保存快照: {e}") from None
+    parts = [header, pack_grid(engine.grid), pack_moves(engine)]
+    if flags & FLAG_RNG:
+        _, words, gauss = state
+        parts.append(RNG_STATE.pack(*words, math.nan if gauss is None else gauss))
+    if frontend:
+        parts.append(_pack_frontend(engine))
+    return b"".join(parts)
+
+
+def sign(data, key):
+    # 在快照末尾附加 HMAC，快照交给客户端等不可信的一方保存时使用
+    return data + hmac.digest(key, data, DIGEST)
+
+
+def verify(data, key):
+    # 校验并去掉 sign 附加的 HMAC，返回原快照；被篡改或密钥不同时抛出 SnapshotError
+    data, tag = data[:-TAG_SIZE], data[-TAG_SIZE:]
+    if len(tag) != TAG_SIZE or not hmac.compare_digest(tag, hmac.digest(key, data, DIGEST)):
+        raise SnapshotError("快照签名无效")
+    return data
+
+
+def _pack_frontend(game):
+    animations = game.animations
+    parts = [
+        FRONTEND.pack(game.display_score, animations.now, len(animations)),
+        pack_grid(game.view),
+    ]
+    for anim in animations.active.values():
+        try:
+            kind = ANIMATION_KINDS.index(anim.kind)
+        except ValueError:
+            raise SnapshotError(f"未知的动画类型: {anim.kind}") from None
+        parts.append(ANIMATION.pack(anim.row, anim.col, kind, anim.dx, anim.dy, anim.start, anim.duration))
+    # 等待回放的连锁层：层数，每层的事件数，每个事件是类型(1 字节) + 连锁层 + 参数
+    buf = bytearray()
+    write_varint(buf, len(game.playback))
+    for events in game.playback:
+        write_varint(buf, len(events))
+        for event in events:
+            kind = event[0]
+            buf.append(EVENT_CODES[kind])
+            write_varint(buf, event[1])
+            if kind == EVENT_REMOVE:
+                write_varint(buf, len(event[2]))
+                for row, col in event[2]:
+                    write_varint(buf, row)
+                    write_varint(buf, col)
+            elif kind == EVENT_SHUFFLE:
+                buf += pack_grid(event[2])
+            else:
+                for value in event[2:]:
+                    write_varint(buf, value)
+    parts.append(bytes(buf))
+    return b"".join(parts)
+
+
+def read_header(data):
+    # 返回 (flags, size, colors, seed, score, remaining, game_time, target, selected_row, selected_col)
+    if len(data) < HEADER.size:
+        raise SnapshotError("快照数据被截断")
+    header = HEADER.unpack_from(data)
+    if header[0] != MAGIC:
+        raise SnapshotError("不是快照文件")
+    if header[1] != VERSION:
+        raise SnapshotError(f"不支持的快照版本: {header[1]}")
+    return header[2:]
+
+
+def load(data, cls=Engine, trusted=True, **kwargs):
+    # 从快照创建一个新的引擎（cls 可以是 Engine 的子类，kwargs 传给构造函数，例如 clock）
+    # 直接使用快照里的棋盘，不重新生成，开销与棋盘大小成正比
+    # trusted=False 时检查棋盘（check_grid），忽略快照里的合法交换索引并重建；
+    # 分数和时间无法从棋盘上校验，不可信的快照必须先用 verify 认证
+    flags, size, colors, seed, _, _, game_time, target, _, _ = read_header(data)
+    moves, _ = unpack_moves(data, size, HEADER.size + size * size)
+    grid = unpack_grid(data, size, HEADER.size)
+    if not trusted:
+        check_grid(grid, colors)
+        moves = None
+    engine = cls(
+        grid_size=size, num_colors=colors, seed=seed if flags & FLAG_SEED else None,
+        game_time=game_time, target_score=target if flags & FLAG_TARGET else None,
+        grid=grid, moves=moves, **kwargs,
+    )
+    _restore_state(engine, data, grid=False)
+    return engine
+
+
+def restore(engine, data, trusted=True):
+    # 把快照恢复到已有的引擎上（棋盘大小可以不同），用于每帧快照后的即时恢复
+    _restore_state(engine, data, trusted=trusted)
+
+
+def _restore_state(engine, data, grid=True, trusted=True):
+    flags, size, colors, seed, score, remaining, game_time, target, row, col = read_header(data)
+    pos = HEADER.size
+    moves, end = unpack_moves(data, size, pos + size * size)
+    if grid:
+        cells = unpack_grid(data, size, pos)
+        if not trusted:
+            check_grid(cells, colors)
+            moves = None
+    engine.grid_size = size
+    engine.num_colors = colors
+    engine.game_time = game_time
+    engine.target_score = target if flags & FLAG_TARGET else None
+    if grid:
+        engine.set_grid(cells, moves)
+    pos = end
+    if grid and flags & FLAG_SEED:
+        engine.seed = seed
+        engine.rng = random.Random(seed)
+    if flags & FLAG_RNG:
+        if len(data) < pos + RNG_STATE.size:
+            raise SnapshotError("快照数据被截断")
+        *words, gauss = RNG_STATE.unpack_from(data, pos)
+        pos += RNG_STATE.size
+        try:
+            engine.rng.setstate((3, tuple(words), None if math.isnan(gauss) else gauss))
+        except (ValueError, TypeError):
+            raise SnapshotError("快照中的随机数状态无效") from None
+    engine.score = score
+    engine.game_over = bool(flags & FLAG_GAME_OVER)
+    engine.victory = bool(flags & FLAG_VICTORY)
+    engine.paused = bool(flags & FLAG_PAUSED)
+    engine.paused_remaining_time = remaining
+    engine.end_time = engine.clock() + remaining
+    engine.start_time = engine.end_time - game_time
+    if hasattr(engine, "selected"):
+        engine.selected = (row, col) if flags & FLAG_SELECTED else None
+    if flags & FLAG_FRONTEND and hasattr(engine, "animations"):
+        _restore_frontend(engine, data, pos)
+
+
+def _restore_frontend(game, data, pos):
+    size = game.grid_size
+    if len(data) < pos + FRONTEND.size:
+        raise SnapshotError("快照数据被截断")
+    game.display_score, now, count = FRONTEND.unpack_from(data, pos)
+    pos += FRONTEND.size
+    game.view = unpack_grid(data, size, pos)
+    pos += size * size
+    animations = game.animations
+    animations.clear()
+    animations.now = now
+    if len(data) < pos + count * ANIMATION.size:
+        raise SnapshotError("快照数据被截断")
+    for row, col, kind, dx, dy, start, duration in ANIMATION.iter_unpack(data[pos:pos + count * ANIMATION.size]):
+        animations.add(row, col, ANIMATION_KINDS[kind], dx, dy, duration)
+        animations.active[(row, col)].start = start
+    pos += count * ANIMATION.size
+    game.playback.clear()
+    try:
+        levels, pos = read_varint(data, pos)
+        for _ in range(levels):
+            count, pos = read_varint(data, pos)
+            events = []
+            for _ in range(count):
+                kind = EVENT_KINDS[data[pos]]
+                level, pos = read_varint(data, pos + 1)
+                if kind == EVENT_REMOVE:
+                    cells, pos = read_varint(data, pos)
+                    values = []
+                    for _ in range(cells):
+                        row, pos = read_varint(data, pos)
+                        col, pos = read_varint(data, pos)
+                        values.append((row, col))
+                    events.append((kind, level, values))
+                elif kind == EVENT_SHUFFLE:
+                    events.append((kind, level, unpack_grid(data, size, pos)))
+                    pos += size * size
+                else:
+                    values = []
+                    for _ in range(1 if kind == EVENT_SCORE else 3):
+                        value, pos = read_varint(data, pos)
+                        values.append(value)
+                    events.append((kind, level, *values))
+            game.playback.append(events)
+    except (ReplayError, IndexError, KeyError):
+        raise SnapshotError("快照数据被截断") from None
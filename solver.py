@@ -0,0 +1,225 @@
+import argparse
+import multiprocessing
+import random
+import signal
+import time
+from collections import OrderedDict
+
+from bitboard import BitBoard
+from engine import Engine, GRID_SIZE, COLORS
+from replay import ReplayClock
+from snapshot import pack_grid, unpack_grid
+
+# 前瞻求解器：对每个候选交换做蒙特卡洛模拟——在位棋盘上用与 Engine 相同的规则
+# 结算连锁（随机补充新方块），之后再随机走 depth - 1 步，以平均总得分评估交换
+# 候选交换分给进程池中的工作进程并行模拟，每次决策有时间预算
+# 模拟结果按棋盘保存在置换表里：每次求解都用完整个时间预算（或让每个交换都达到样本上限），
+# 同一局面再次求解时直接返回缓存的结果
+#
+# 无界面使用：solver.best_move(engine) 阻塞返回交换
+# 在 pygame 主循环中使用：solver.request(engine) 提交后台计算，之后每帧调用 solver.poll()，
+# 算完前返回 None，界面不会被阻塞
+
+DEFAULT_DEPTH = 3
+DEFAULT_BUDGET = 0.3  # 每次决策的时间预算（秒）
+DEFAULT_MAX_SAMPLES = 64  # 每个交换最多模拟的次数
+CACHE_SIZE = 4096  # 置换表最多保存的局面数
+
+
+def background_workers():
+    # 界面中后台求解用的进程数：留出一个核给 pygame 主循环，求解时界面仍能保持帧率
+    return max(1, multiprocessing.cpu_count() - 1)
+
+
+# 棋盘的紧凑字节表示：既是置换表的键，也直接发给工作进程，比嵌套列表复制和序列化都便宜
+board_key = pack_grid
+
+
+def _init_worker():
+    # pygame（SDL）初始化后会捕获 SIGTERM，fork 出的工作进程继承了这个处理函数，
+    # close() 中的 terminate() 就杀不掉它们而一直等下去；工作进程恢复默认处理
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def rollouts(task):
+    # 工作进程：对 moves 中的每个交换轮流模拟，直到用完时间预算或达到样本上限
+    # 每次模拟后都检查时间，交换很多时一轮也可能走不完；顺序按种子打乱，没轮到的交换每次不同
+    # 返回 {交换: [总得分, 样本数]}，只包含模拟过的交换
+    key, size, num_colors, moves, depth, budget, max_samples, seed = task
+    base = BitBoard.from_grid(unpack_grid(key, size), num_colors)
+    rng = random.Random(seed)
+    order = list(moves)
+    rng.shuffle(order)
+    stats = {}
+    deadline = time.perf_counter() + budget if budget else None
+    for _ in range(max_samples):
+        for move in order:
+            board = base.copy()
+            board.rng = rng
+            board.swap(*move)
+            board.settle()
+            for _ in range(depth - 1):
+                follow = board.legal_moves()
+                if not follow:
+                    break
+                board.swap(*rng.choice(follow))
+                board.settle()
+            entry = stats.setdefault(move, [0, 0])
+            entry[0] += board.score
+            entry[1] += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                return stats
+    return stats
+
+
+class Solver:
+    def __init__(self, workers=None, time_budget=DEFAULT_BUDGET, depth=DEFAULT_DEPTH,
+                 max_samples=DEFAULT_MAX_SAMPLES, seed=None):
+        # time_budget 为 None 时不限时间，每个交换固定模拟 max_samples 次，进程数和种子相同时结果可复现
+        self.workers = workers or multiprocessing.cpu_count()
+        self.time_budget = time_budget
+        self.depth = depth
+        self.max_samples = max_samples
+        self.rng = random.Random(seed)
+        self.pool = None  # 进程池在第一次求解时创建
+        self.cache = OrderedDict()  # 棋盘 -> {交换: [总得分, 样本数]}，只保存完整求解过的局面
+        self.hits = 0
+        self.pending = None  # (棋盘, 交换, AsyncResult)，交换已知时 AsyncResult 为 None
+
+    def _ensure_pool(self):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker)
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self.pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _tasks(self, key, engine, moves):
+        # 把候选交换轮流分给各个工作进程
+        groups = [moves[i::self.workers] for i in range(min(self.workers, len(moves)))]
+        return [
+            (key, engine.grid_size, engine.num_colors, group, self.depth, self.time_budget, self.max_samples,
+             self.rng.getrandbits(64))
+            for group in groups
+        ]
+
+    def _lookup(self, key):
+        stats = self.cache.get(key)
+        if stats is not None:
+            self.cache.move_to_end(key)
+        return stats
+
+    def _store(self, key, results):
+        # 各工作进程负责的交换互不重叠，合并后存入置换表
+        stats = {}
+        for part in results:
+            stats.update(part)
+        self.cache[key] = stats
+        self.cache.move_to_end(key)
+        if len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return stats
+
+    @staticmethod
+    def _choose(stats):
+        # 平均得分最高的交换（时间预算用完前没模拟到的交换不参与），平分时取排序靠前的，保证结果稳定
+        return max(sorted(stats), key=lambda move: stats[move][0] / stats[move][1])
+
+    def best_move(self, engine):
+        # 阻塞求解，返回最佳交换；没有合法交换时返回 None
+        engine.sync_moves()
+        moves = sorted(engine.moves)
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+        key = board_key(engine.grid)
+        stats = self._lookup(key)
+        if stats is not None:
+            self.hits += 1
+            return self._choose(stats)
+        results = self._ensure_pool().map(rollouts, self._tasks(key, engine, moves))
+        return self._choose(self._store(key, results))
+
+    def request(self, engine):
+        # 提交后台求解，之前未完成的请求被丢弃；返回 False 表示不需要计算，下次 poll 直接得到结果
+        engine.sync_moves()
+        moves = sorted(engine.moves)
+        key = board_key(engine.grid)
+        if len(moves) <= 1:
+            self.pending = (key, moves[0] if moves else None, None)
+            return False
+        stats = self._lookup(key)
+        if stats is not None:
+            self.hits += 1
+            self.pending = (key, self._choose(stats), None)
+            return False
+        result = self._ensure_pool().map_async(rollouts, self._tasks(key, engine, moves))
+        self.pending = (key, None, result)
+        return True
+
+    def poll(self):
+        # 后台求解完成时返回 (棋盘, 交换)，棋盘用 board_key 表示，调用方据此确认局面没有变化
+        # 还在计算或没有请求时返回 None
+        if self.pending is None:
+            return None
+        key, move, result = self.pending
+        if result is not None:
+            if not result.ready():
+                return None
+            move = self._choose(self._store(key, result.get()))
+        self.pending = None
+        return key, move
+
+    def cancel(self):
+        self.pending = None
+
+
+def play(solver, seed, size=GRID_SIZE, num_colors=None, move_time=1.5):
+    # 用求解器无界面地玩一局（时间模型与 simulate.py 相同，不计连锁动画），返回 (分数, 步数)
+    clock = ReplayClock()
+    engine = Engine(size, num_colors, clock=clock, seed=seed)
+    moves = 0
+    while True:
+        clock.now += move_time
+        engine.update_timer()
+        if engine.game_over or engine.victory:
+            return engine.score, moves
+        engine.apply_move(*solver.best_move(engine), record=False)
+        moves += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用前瞻求解器无界面地自动玩若干局")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=GRID_SIZE)
+    parser.add_argument("--colors", type=int, default=len(COLORS))
+    parser.add_argument("--workers", type=int, help="进程数，默认使用全部 CPU")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="每次模拟走的步数")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="每次决策的时间预算（秒），0 表示不限时")
+    parser.add_argument("--samples", type=int, default=DEFAULT_MAX_SAMPLES, help="每个交换最多模拟的次数")
+    args = parser.parse_args()
+
+    with Solver(args.workers, args.budget or None, args.depth, args.samples, args.seed) as solver:
+        began = time.perf_counter()
+        total_moves = 0
+        for index in range(args.games):
+            score, moves = play(solver, args.seed * 1000003 + index, args.size, args.colors)
+            total_moves += moves
+            print(f"第 {index + 1} 局: {score} 分, {moves} 步")
+        elapsed = time.perf_counter() - began
+        print(f"平均每步决策 {elapsed / max(1, total_moves) * 1000:.0f} 毫秒, 置换表命中 {solver.hits} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import pygame
+
+# 方块精灵图集：启动时把每种颜色的圆角方块和选中边框预先画好，
+# 并转换为显示格式，绘制棋盘时只需批量 blit
+
+TILE_BORDER_COLOR = (200, 200, 200)
+
+
+class TileSprites:
+    def __init__(self, cell_size, colors):
+        # 间隙、圆角和边框宽度随格子大小缩放，格子边长 60 时分别为 4、10、2
+        self.cell_size = cell_size
+        self.gap = max(1, cell_size // 15)
+        size = cell_size - self.gap
+        radius = cell_size // 6
+        border = 2 if cell_size >= 30 else 1
+        self.tiles = []
+        for color in colors:
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.rect(surface, color, (0, 0, size, size), 0, radius)
+            pygame.draw.rect(surface, TILE_BORDER_COLOR, (0, 0, size, size), border, radius)
+            self.tiles.append(surface.convert_alpha())
+        self.frames = {}
+
+    def frame(self, color):
+        # 选中/提示边框，按颜色缓存；绘制在格子左上角向外偏移 gap 的位置
+        surface = self.frames.get(color)
+        if surface is None:
+            size = self.cell_size + self.gap
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.rect(surface, color, (0, 0, size, size), max(1, self.cell_size // 20), self.cell_size // 5)
+            surface = self.frames[color] = surface.convert_alpha()
+        return surface
@@ -0,0 +1,69 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from batch import BatchEngine
+from engine import Engine, EMPTY, SCORE_PER_TILE
+from replay import ReplayClock
+
+
+def random_batch(size, num_colors, seed, num_boards=20):
+    # 随机棋盘（大多含有三连），每个棋盘再配一个装着同一棋盘的 Engine
+    batch = BatchEngine(num_boards, size, num_colors, seed)
+    batch.grids[...] = batch.random_tiles(batch.grids.shape)
+    engines = []
+    for grid in batch.grids.tolist():
+        engine = Engine(size, num_colors, clock=ReplayClock(), seed=seed, target_score=None)
+        engine.grid = grid
+        engine.mark_all_dirty()
+        engines.append(engine)
+    return batch, engines
+
+
+def test_matches_and_scores_match_engine():
+    for seed, (size, num_colors) in enumerate([(3, 3), (8, 6), (13, 4), (8, 3)]):
+        batch, engines = random_batch(size, num_colors, seed)
+        matches = batch.find_matches()
+        for board, engine in enumerate(engines):
+            cells = sorted(zip(*np.nonzero(matches[board])))
+            assert [(int(r), int(c)) for r, c in cells] == sorted(engine.find_matches())
+        counts = batch.remove_matches(matches)
+        for board, engine in enumerate(engines):
+            engine.remove_matches()
+            assert batch.grids[board].tolist() == engine.grid
+            assert int(batch.scores[board]) == engine.score
+            assert int(counts[board]) * SCORE_PER_TILE == engine.score
+
+
+def test_gravity_keeps_column_order():
+    # 消除后每列剩下的方块按原来的顺序落到底部，和 Engine 的下落结果一致，顶部补满新方块
+    for seed, size in enumerate((3, 8, 16)):
+        batch, engines = random_batch(size, 4, seed)
+        batch.remove_matches()
+        before = batch.grids.copy()
+        batch.fill_empty_cells()
+        for board, engine in enumerate(engines):
+            engine.remove_matches()
+            engine.fill_empty_cells()
+            for col in range(size):
+                kept = [color for color in before[board, :, col].tolist() if color != EMPTY]
+                column = batch.grids[board, :, col].tolist()
+                assert column[size - len(kept):] == kept
+                assert [row[col] for row in engine.grid][size - len(kept):] == kept
+                assert all(0 <= color < 4 for color in column)
+
+
+@pytest.mark.parametrize("num_colors", [3, 4, 5, 6])
+def test_initialize_grids_has_no_matches(num_colors):
+    for size in (3, 8, 24):
+        batch = BatchEngine(50, size, num_colors, seed=size)
+        assert not batch.find_matches().any()
+        assert batch.grids.min() >= 0 and batch.grids.max() < num_colors
+        assert not batch.scores.any()
+        # 每种颜色都会用到，没有被排除掉的颜色
+        assert len(np.unique(batch.grids)) == num_colors
+
+
+def test_initialize_grids_needs_three_colors():
+    with pytest.raises(ValueError):
+        BatchEngine(4, 8, 2, seed=0)
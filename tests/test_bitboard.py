@@ -0,0 +1,43 @@
+import random
+
+from bitboard import BitBoard
+from engine import Engine, EVENT_SHUFFLE
+from replay import ReplayClock
+
+
+def copy_rng(rng):
+    copy = random.Random()
+    copy.setstate(rng.getstate())
+    return copy
+
+
+def test_find_matches_matches_list_board():
+    rng = random.Random(0)
+    for size in (3, 8, 13):
+        engine = Engine(size, seed=1)
+        for _ in range(50):
+            grid = [[rng.randrange(engine.num_colors) for _ in range(size)] for _ in range(size)]
+            engine.grid = grid
+            engine.mark_all_dirty()
+            board = BitBoard.from_grid(grid, engine.num_colors)
+            assert sorted(board.find_matches()) == sorted(engine.find_matches())
+
+
+def test_cascades_match_engine():
+    # 同一个随机数状态下，位棋盘结算出的棋盘、分数和合法交换与 Engine 完全一致
+    for seed in range(100):
+        size = (8, 16, 5)[seed % 3]
+        engine = Engine(size, clock=ReplayClock(), seed=seed, target_score=None)
+        board = BitBoard.from_grid(engine.grid, engine.num_colors, copy_rng(engine.rng))
+        assert board.legal_moves() == sorted(engine.moves)
+        for _ in range(20):
+            move = engine.hint()
+            log = engine.apply_move(*move, record=False)
+            if any(event[0] == EVENT_SHUFFLE for event in log):
+                # 死局洗牌只在 Engine 中实现
+                break
+            board.swap(*move)
+            board.settle()
+            assert board.to_grid() == engine.grid
+            assert board.score == engine.score
+            assert board.legal_moves() == sorted(engine.moves)
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from engine import Engine, match_free_grid
+from replay import ReplayClock
+
+
+def brute_force_moves(engine):
+    # 逐个尝试交换，得到 {交换: 直接消除的方块数}
+    size = engine.grid_size
+    moves = {}
+    for row in range(size):
+        for col in range(size):
+            for other in ((row, col + 1), (row + 1, col)):
+                if other[0] < size and other[1] < size:
+                    engine.swap((row, col), other)
+                    matched = engine.find_matches()
+                    engine.swap(other, (row, col))
+                    engine.find_matches()
+                    if matched:
+                        moves[((row, col), other)] = len(matched)
+    return moves
+
+
+def has_run(grid):
+    # 是否有水平或竖直的三连
+    size = len(grid)
+    for row in range(size):
+        for col in range(size):
+            color = grid[row][col]
+            if col + 2 < size and grid[row][col + 1] == color == grid[row][col + 2]:
+                return True
+            if row + 2 < size and grid[row + 1][col] == color == grid[row + 2][col]:
+                return True
+    return False
+
+
+def test_stepped_cascade_matches_apply_move():
+    # begin_move + 逐层 resolve_level 与一次性 apply_move 的日志、棋盘和分数一致
+    for seed in range(30):
+        size = (8, 12, 5)[seed % 3]
+        whole = Engine(size, clock=ReplayClock(), seed=seed, target_score=None)
+        stepped = Engine(size, clock=ReplayClock(), seed=seed, target_score=None)
+        rng = random.Random(seed)
+        for _ in range(20):
+            move = rng.choice(sorted(whole.moves))
+            log = whole.apply_move(*move)
+            steps = stepped.begin_move(*move)
+            assert stepped.begin_move(*move) is None  # 连锁结算完之前不接受新的交换
+            while stepped.resolve_level():
+                pass
+            assert steps == log
+            assert stepped.grid == whole.grid and stepped.score == whole.score
+
+
+def test_move_index_matches_brute_force():
+    for seed in range(20):
+        engine = Engine((4, 6, 8, 10)[seed % 4], num_colors=(3, 4, 5, 6)[seed % 4],
+                        clock=ReplayClock(), seed=seed, target_score=None)
+        rng = random.Random(seed)
+        for _ in range(10):
+            engine.apply_move(*rng.choice(sorted(engine.moves)))
+            moves = brute_force_moves(engine)
+            engine.sync_moves()
+            assert engine.moves.moves == moves
+            size = engine.grid_size
+            for row in range(size):
+                for col in range(size - 1):
+                    pair = ((row, col), (row, col + 1))
+                    assert engine.is_legal(*pair) == (pair in moves)
+            best = engine.moves.best_move()
+            assert moves[best] == max(moves.values())
+
+
+@pytest.mark.parametrize("num_colors", [3, 4, 5, 6])
+def test_generated_grid_has_no_runs_and_a_move(num_colors):
+    for seed, size in enumerate((3, 4, 5, 8, 17, 64)):
+        grid = match_free_grid(size, num_colors, random.Random(seed))
+        assert not has_run(grid)
+        assert all(0 <= color < num_colors for line in grid for color in line)
+        engine = Engine(size, num_colors, clock=ReplayClock(), seed=seed)
+        assert not has_run(engine.grid)
+        move = engine.hint()
+        engine.swap(*move)
+        assert has_run(engine.grid)
+
+
+def test_plant_move_on_board_without_moves():
+    # 小棋盘、3 种颜色时构造出的棋盘经常没有合法交换，植入后恰好有合法交换且仍没有三连
+    planted = 0
+    for seed in range(200):
+        size = 3 + seed % 3
+        engine = Engine(size, 3, clock=ReplayClock(), seed=seed)
+        engine.set_grid(match_free_grid(size, 3, random.Random(seed)))
+        if brute_force_moves(engine):
+            continue
+        assert engine.plant_move()
+        assert not has_run(engine.grid)
+        engine.sync_moves()
+        assert engine.moves.moves == brute_force_moves(engine) != {}
+        planted += 1
+    assert planted >= 10
+
+
+def test_generated_grid_rejects_too_few_colors_or_cells():
+    rng = random.Random(0)
+    for size, num_colors in ((8, 2), (8, 1), (2, 6), (1, 3)):
+        with pytest.raises(ValueError):
+            match_free_grid(size, num_colors, rng)
+        with pytest.raises(ValueError):
+            Engine(size, num_colors, clock=ReplayClock(), seed=0)
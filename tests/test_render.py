@@ -0,0 +1,130 @@
+import os
+import random
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+import xxl
+from replay import ReplayClock
+
+
+def click(game, cell):
+    x, y = game.viewport.cell_to_screen(*cell)
+    game.handle_click((x + 2, y + 2))
+
+
+@pytest.mark.parametrize("size", [8, 40])
+def test_partial_redraw_matches_full_redraw(size):
+    # 每帧只重绘变化区域后的画面与整块重绘完全相同
+    if xxl.screen is None:
+        xxl.init_display()
+    rng = random.Random(size)
+    clock = ReplayClock()
+    game = xxl.Game(seed=size, clock=clock, grid_size=size)
+    partial = 0
+    for _ in range(150):
+        clock.now += xxl.LOGIC_STEP
+        game.update_animations(xxl.LOGIC_STEP)
+        if game.can_move():
+            x = rng.random()
+            if x < 0.1:
+                game.set_hint(game.hint())
+            elif x < 0.5:
+                for cell in rng.choice(list(game.moves)) if x < 0.4 else ((0, 0), (0, 1)):
+                    click(game, cell)
+            elif x < 0.55:
+                game.scroll_view(rng.randint(-30, 30), rng.randint(-30, 30))
+        game.draw(rng.random())
+        if any(game.drawn_overlays):
+            game.present()
+            continue
+        partial += game.dirty_rects != [xxl.screen.get_rect()]
+        game.present()
+        drawn = pygame.image.tostring(xxl.screen, "RGB")
+        game.invalidate_board()
+        game.draw_board()
+        game.dirty_rects = []
+        assert pygame.image.tostring(xxl.screen, "RGB") == drawn
+    assert partial
+
+
+def test_pause_during_playback_goes_idle():
+    # 回放连锁时暂停：动画冻结，主循环进入空闲，之后的帧不再提交任何区域
+    if xxl.screen is None:
+        xxl.init_display()
+    game = xxl.Game(seed=5, clock=ReplayClock())
+    game.draw()
+    game.present()
+    game.start_playback(game.begin_move(*game.hint()))
+    for _ in range(3):
+        game.update_animations(xxl.LOGIC_STEP)
+        game.draw(0.5)
+        game.present()
+    assert game.is_playing()
+    game.toggle_pause()
+    assert game.is_idle()
+    game.draw(0.5)
+    game.present()
+    for _ in range(3):
+        game.update_animations(xxl.LOGIC_STEP)
+        game.draw(0.5)
+        assert game.dirty_rects == []
+        game.present()
+    assert game.is_idle()
+    game.toggle_pause()
+    assert not game.is_idle()
+    while game.is_playing():
+        game.update_animations(xxl.LOGIC_STEP)
+    assert game.view == game.grid
+
+
+def playing_game(seed, quick_save=False):
+    # 走到一次产生连锁的交换，停在回放中途
+    if xxl.screen is None:
+        xxl.init_display()
+    game = xxl.Game(seed=seed, clock=ReplayClock())
+    for _ in range(20):
+        game.start_playback(game.begin_move(*game.hint()))
+        game.update_animations(xxl.LOGIC_STEP)
+        if quick_save:
+            game.save_snapshot()  # 把剩余连锁全部结算进回放队列
+        if game.playback or game.cascade_log is not None:
+            break
+        while game.is_playing():
+            game.update_animations(xxl.LOGIC_STEP)
+    assert game.is_playing()
+    return game
+
+
+def assert_final_board(game):
+    assert game.game_over
+    assert game.view == game.grid
+    assert game.display_score == game.score > 0
+    assert not game.animations and not game.playback
+    assert game.overlay_state()[2]
+    assert game.is_idle()
+
+
+@pytest.mark.parametrize("quick_save", [False, True])
+def test_time_out_during_playback_shows_final_board(quick_save):
+    # 回放连锁时时间用完：显示棋盘和分数直接跳到结算结果，出现结束画面
+    game = playing_game(5, quick_save)
+    game.clock.now = game.end_time + 1
+    game.update_animations(xxl.LOGIC_STEP)
+    assert_final_board(game)
+
+
+def test_restored_finished_game_shows_final_board():
+    # 恢复一个已经结束、还有等待回放的连锁的快照
+    game = playing_game(5, True)
+    data = bytearray(xxl.snapshot.save(game))
+    data[5] |= xxl.snapshot.FLAG_GAME_OVER
+    restored = xxl.snapshot.load(bytes(data), cls=xxl.Game, clock=game.clock)
+    assert restored.playback
+    restored.show_final_board()
+    assert_final_board(restored)
+    game.load_snapshot(bytes(data))
+    assert_final_board(game)
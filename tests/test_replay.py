@@ -0,0 +1,53 @@
+from engine import Engine
+from replay import Recorder, ReplayClock, play
+
+
+def record_game(seed, moves):
+    clock = ReplayClock()
+    engine = Engine(clock=clock, seed=seed)
+    recorder = Recorder(engine)
+    for _ in range(moves):
+        clock.now += 0.5
+        move = engine.hint()
+        assert engine.apply_move(*move) is not None
+        recorder.record_swap(*move)
+    return engine, clock, recorder
+
+
+def test_replay_round_trip():
+    for seed in range(20):
+        engine, _, recorder = record_game(seed, 10)
+        replayed, _ = play(recorder.finish())
+        assert replayed.score == engine.score
+        assert replayed.grid == engine.grid
+
+
+def test_swap_after_end_time_is_rejected():
+    # 时间到了但还没有调用 update_timer 时，交换也必须被拒绝，否则录像回放时分数对不上
+    engine, clock, recorder = record_game(1, 3)
+    clock.now = engine.end_time + 0.001
+    assert engine.apply_move(*engine.hint()) is None
+    assert engine.game_over
+    replayed, _ = play(recorder.finish())
+    assert replayed.score == engine.score
+
+
+
+def test_swap_just_before_end_time_is_replayed():
+    # 结束前不到 1 毫秒接受的交换回放时也必须被接受，中间的暂停和恢复不能让结束时间提前
+    for seed in range(20):
+        engine, clock, recorder = record_game(seed, 3)
+        for _ in range(seed % 2 * 5):
+            clock.now += 0.1234567
+            engine.toggle_pause()
+            recorder.record_pause()
+            clock.now += 0.7654321
+            engine.toggle_pause()
+            recorder.record_resume()
+        clock.now = engine.end_time - 0.0004
+        move = engine.hint()
+        assert engine.apply_move(*move) is not None
+        recorder.record_swap(*move)
+        replayed, _ = play(recorder.finish())
+        assert replayed.score == engine.score
+        assert replayed.grid == engine.grid
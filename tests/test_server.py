@@ -0,0 +1,58 @@
+import asyncio
+
+from server import (
+    GameServer, Client, encode, parse_full, read_varint,
+    MSG_NEW, MSG_SWAP, MSG_STATE, MSG_SUSPEND, MSG_FULL, MSG_SNAPSHOT, MSG_ERROR, MAX_GRID_SIZE, MAX_COLORS, ERROR_BAD_MESSAGE, ERROR_BAD_PARAMS,
+)
+
+
+def test_errors_reach_the_waiting_request():
+    async def run():
+        server = GameServer()
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        client = await Client.connect("127.0.0.1", port)
+        try:
+            kind, body = await client.request(encode(MSG_NEW, 1, 8, 6))
+            assert kind == MSG_FULL
+            sid = parse_full(body)[0]
+            # 参数个数错误的 SWAP：错误回复带着会话编号，等待中的请求能拿到它
+            kind, body = await asyncio.wait_for(client.request(encode(MSG_SWAP, sid, 0, 0), sid), 5)
+            assert kind == MSG_ERROR
+            assert read_varint(body, 1)[0] == sid
+            assert read_varint(body, 2)[0] == ERROR_BAD_MESSAGE
+            kind, _ = await client.request(encode(MSG_STATE, sid), sid)
+            assert kind == MSG_FULL
+            kind, body = await client.request(encode(MSG_NEW, 1, MAX_GRID_SIZE + 1, 6))
+            assert kind == MSG_ERROR and read_varint(body, 2)[0] == ERROR_BAD_PARAMS
+        finally:
+            await client.close()
+            listener.close()
+            await listener.wait_closed()
+    asyncio.run(run())
+
+
+def test_color_count_is_limited_to_signed_bytes():
+    # 棋盘按有符号字节打包，超过 127 种颜色的请求被拒绝，连接和其他会话不受影响
+    async def run():
+        server = GameServer()
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        client = await Client.connect("127.0.0.1", port)
+        try:
+            kind, body = await client.request(encode(MSG_NEW, 1, 8, 6))
+            sid = parse_full(body)[0]
+            for colors in (MAX_COLORS + 1, 200, 255):
+                kind, body = await asyncio.wait_for(client.request(encode(MSG_NEW, 1, 8, colors)), 5)
+                assert kind == MSG_ERROR and read_varint(body, 2)[0] == ERROR_BAD_PARAMS
+            kind, body = await client.request(encode(MSG_NEW, 1, 8, MAX_COLORS))
+            assert kind == MSG_FULL
+            kind, _ = await client.request(encode(MSG_SUSPEND, parse_full(body)[0]), parse_full(body)[0])
+            assert kind == MSG_SNAPSHOT
+            kind, _ = await client.request(encode(MSG_STATE, sid), sid)
+            assert kind == MSG_FULL
+        finally:
+            await client.close()
+            listener.close()
+            await listener.wait_closed()
+    asyncio.run(run())
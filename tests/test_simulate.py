@@ -0,0 +1,29 @@
+import pytest
+
+from simulate import simulate, report
+
+CONFIG = {
+    "policy": "greedy",
+    "seed": 3,
+    "size": 8,
+    "colors": 6,
+    "game_times": [15, 30],
+    "targets": [200, 400],
+    "move_time": 1.5,
+    "level_time": 0.25,
+}
+
+
+def stable(summary, config):
+    # 汇总结果中除 CPU 时间以外的部分只由配置和对局数决定
+    return report(summary, config, 1.0, 1)["by_time"], summary["cascades"], summary["moves"], summary["games"]
+
+
+@pytest.mark.parametrize("policy", ["greedy", "random"])
+def test_pool_matches_single_worker(policy):
+    # 单进程顺序模拟和进程池乱序合并（块大小不同）得到完全相同的汇总结果
+    config = dict(CONFIG, policy=policy)
+    single = simulate(config, 24, workers=1, chunk=24)
+    pooled = simulate(config, 24, workers=3, chunk=5)
+    assert single["games"] == 24
+    assert stable(single, config) == stable(pooled, config)
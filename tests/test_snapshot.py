@@ -0,0 +1,101 @@
+import asyncio
+import struct
+
+import pytest
+
+import snapshot
+from engine import Engine
+from replay import ReplayClock
+from server import GameServer, encode, parse_snapshot, read_varint, MSG_SUSPEND, MSG_RESUME, MSG_SNAPSHOT, MSG_FULL, MSG_ERROR
+
+
+SCORE = struct.calcsize("<4sBBHBq")  # 文件头里分数字段的偏移
+
+
+def played_engine(seed=3, size=8):
+    engine = Engine(size, clock=ReplayClock(), seed=seed)
+    for _ in range(5):
+        engine.apply_move(*engine.moves.best_move())
+    return engine
+
+
+def rng_offset(data, size):
+    pos = snapshot.HEADER.size + size * size
+    (count,) = snapshot.COUNT.unpack_from(data, pos)
+    return pos + snapshot.COUNT.size + count * 5
+
+
+def test_round_trip():
+    engine = played_engine()
+    for trusted in (True, False):
+        loaded = snapshot.load(snapshot.save(engine), clock=engine.clock, trusted=trusted)
+        assert loaded.grid == engine.grid and loaded.score == engine.score
+        loaded.sync_moves()
+        engine.sync_moves()
+        assert loaded.moves.moves == engine.moves.moves
+        move = engine.moves.best_move()
+        assert loaded.apply_move(*move) == engine.apply_move(*move)
+
+
+def test_untrusted_snapshot_is_checked():
+    engine = played_engine()
+    data = bytearray(snapshot.save(engine))
+    cell = bytearray(data)
+    cell[snapshot.HEADER.size] = 200  # 按有符号字节读出是 -56
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load(bytes(cell), trusted=False)
+    line = bytearray(data)
+    line[snapshot.HEADER.size:snapshot.HEADER.size + 3] = bytes((1, 1, 1))
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load(bytes(line), trusted=False)
+    # 伪造的合法交换索引被忽略，按棋盘重建
+    moves = bytearray(data)
+    pos = snapshot.HEADER.size + 64 + snapshot.COUNT.size
+    moves[pos:pos + 4] = struct.pack("<I", 0)
+    loaded = snapshot.load(bytes(moves), trusted=False)
+    loaded.sync_moves()
+    engine.sync_moves()
+    assert loaded.moves.moves == engine.moves.moves
+
+
+def test_corrupt_rng_state():
+    data = bytearray(snapshot.save(played_engine()))
+    pos = rng_offset(data, 8) + 624 * 4
+    data[pos:pos + 4] = struct.pack("<I", 0xFFFFFFFF)
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load(bytes(data))
+
+
+def test_signature():
+    data = snapshot.save(played_engine())
+    signed = snapshot.sign(data, b"key")
+    assert snapshot.verify(signed, b"key") == data
+    forged = bytearray(signed)
+    forged[SCORE + 3] ^= 0x3B  # 伪造分数
+    for bad, key in ((bytes(forged), b"key"), (signed, b"other"), (signed[:10], b"key")):
+        with pytest.raises(snapshot.SnapshotError):
+            snapshot.verify(bad, key)
+
+
+def test_server_rejects_forged_or_reused_snapshot():
+    async def run():
+        server = GameServer()
+        server.loop = asyncio.get_running_loop()
+        writer = None
+        engine = played_engine()
+        engine.clock = server.loop.time
+        reply = server.add_session(engine, writer)
+        sid = read_varint(reply, 5)[0]
+        body = server.dispatch(encode(MSG_SUSPEND, sid)[4:], writer)
+        assert body[4] == MSG_SNAPSHOT
+        _, data = parse_snapshot(body[4:])
+        forged = bytearray(data)
+        forged[SCORE + 3] ^= 0x3B
+        assert server.dispatch(bytes((MSG_RESUME,)) + forged, writer)[4] == MSG_ERROR
+        assert server.dispatch(bytes((MSG_RESUME,)) + data, writer)[4] == MSG_FULL
+        # 同一个快照只能恢复一次
+        assert server.dispatch(bytes((MSG_RESUME,)) + data, writer)[4] == MSG_ERROR
+        assert len(server.sessions) == 1
+        for session in list(server.sessions.values()):
+            server.close_session(session)
+    asyncio.run(run())
@@ -0,0 +1,30 @@
+import time
+
+from engine import Engine
+from replay import ReplayClock
+from solver import Solver
+
+
+def test_best_move_is_legal_and_within_budget():
+    # 交换很多的大棋盘上也要按时间预算返回；同一局面再次求解直接命中置换表
+    engine = Engine(64, clock=ReplayClock(), seed=1)
+    with Solver(2, time_budget=0.1) as solver:
+        solver.best_move(Engine(8, clock=ReplayClock(), seed=2))  # 先启动进程池，不计入时间
+        began = time.perf_counter()
+        move = solver.best_move(engine)
+        assert time.perf_counter() - began < 1.0
+        assert engine.is_legal(*move)
+        began = time.perf_counter()
+        assert solver.best_move(engine) == move
+        assert time.perf_counter() - began < 0.1
+        assert solver.hits == 1
+
+
+def test_unbudgeted_search_is_reproducible():
+    engine = Engine(8, clock=ReplayClock(), seed=3)
+    results = []
+    for _ in range(2):
+        with Solver(2, time_budget=None, max_samples=4, seed=7) as solver:
+            results.append(solver.best_move(engine))
+    assert results[0] == results[1]
+    assert engine.is_legal(*results[0])
@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+# 文字渲染缓存：按 (字体, 文本, 颜色) 缓存 font.render 的结果，超出容量时淘汰最久未用的项
+
+
+class TextCache:
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.surfaces),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
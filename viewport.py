@@ -0,0 +1,104 @@
+# 棋盘视口：把很大的棋盘映射到屏幕上固定大小的区域，支持滚动和缩放
+# 只做坐标换算，不依赖 pygame；绘制时只遍历 visible_range() 内的格子
+
+MIN_CELL_SIZE = 8  # 缩小到这个尺寸以下方块已经无法分辨
+ZOOM_FACTOR = 1.25  # 每次缩放的比例
+
+
+class Viewport:
+    def __init__(self, rect, grid_size, cell_size, min_cell_size=MIN_CELL_SIZE, max_cell_size=None):
+        # rect 为屏幕上的显示区域 (x, y, 宽, 高)，cell_size 为初始格子边长（像素）
+        self.x, self.y, self.width, self.height = rect
+        self.grid_size = grid_size
+        self.min_cell_size = min_cell_size
+        self.max_cell_size = cell_size if max_cell_size is None else max_cell_size
+        self.cell_size = cell_size
+        self.scroll_x = 0  # 显示区域左上角在棋盘上的像素坐标
+        self.scroll_y = 0
+        self.clamp()
+
+    @classmethod
+    def fit(cls, rect, grid_size, cell_size, min_cell_size=MIN_CELL_SIZE):
+        # 按棋盘大小选择初始缩放：放得下就整盘显示，放不下就用最小格子从左上角开始
+        _, _, width, height = rect
+        fitted = min(width, height) // grid_size
+        return cls(rect, grid_size, max(min_cell_size, min(cell_size, fitted)), min_cell_size, cell_size)
+
+    def board_pixels(self):
+        return self.grid_size * self.cell_size
+
+    def origin(self):
+        # 棋盘第 0 行第 0 列在屏幕上的位置；棋盘比显示区域小时居中
+        board = self.board_pixels()
+        x = self.x + (self.width - board) // 2 if board < self.width else self.x - self.scroll_x
+        y = self.y + (self.height - board) // 2 if board < self.height else self.y - self.scroll_y
+        return x, y
+
+    def clamp(self):
+        board = self.board_pixels()
+        self.scroll_x = max(0, min(self.scroll_x, board - self.width))
+        self.scroll_y = max(0, min(self.scroll_y, board - self.height))
+
+    def scroll(self, dx, dy):
+        # 按像素滚动，返回视口是否发生了变化
+        before = (self.scroll_x, self.scroll_y)
+        self.scroll_x += dx
+        self.scroll_y += dy
+        self.clamp()
+        return (self.scroll_x, self.scroll_y) != before
+
+    def zoom(self, steps, anchor=None):
+        # 缩放 steps 级（正数放大），anchor 为屏幕坐标，缩放前后该点下的棋盘位置保持不变
+        # 返回视口是否发生了变化
+        cell_size = self.cell_size
+        for _ in range(abs(steps)):
+            if steps > 0:
+                cell_size = max(cell_size + 1, round(cell_size * ZOOM_FACTOR))
+            else:
+                cell_size = min(cell_size - 1, round(cell_size / ZOOM_FACTOR))
+        cell_size = max(self.min_cell_size, min(self.max_cell_size, cell_size))
+        if cell_size == self.cell_size:
+            return False
+        if anchor is None:
+            anchor = (self.x + self.width // 2, self.y + self.height // 2)
+        origin_x, origin_y = self.origin()
+        # 锚点对应的棋盘位置（以格子为单位）
+        board_x = (anchor[0] - origin_x) / self.cell_size
+        board_y = (anchor[1] - origin_y) / self.cell_size
+        self.cell_size = cell_size
+        self.scroll_x = round(board_x * cell_size - (anchor[0] - self.x))
+        self.scroll_y = round(board_y * cell_size - (anchor[1] - self.y))
+        self.clamp()
+        return True
+
+    def visible_range(self):
+        # 返回与显示区域相交的行列范围 (row0, row1, col0, col1)，均为左闭右开
+        origin_x, origin_y = self.origin()
+        cell_size = self.cell_size
+        size = self.grid_size
+        col0 = max(0, (self.x - origin_x) // cell_size)
+        row0 = max(0, (self.y - origin_y) // cell_size)
+        col1 = min(size, -(-(self.x + self.width - origin_x) // cell_size))
+        row1 = min(size, -(-(self.y + self.height - origin_y) // cell_size))
+        return row0, row1, col0, col1
+
+    def cell_to_screen(self, row, col):
+        origin_x, origin_y = self.origin()
+        return origin_x + col * self.cell_size, origin_y + row * self.cell_size
+
+    def screen_to_cell(self, x, y):
+        # 把屏幕坐标转换为格子坐标，不在显示区域或棋盘内时返回 None
+        if not (self.x <= x < self.x + self.width and self.y <= y < self.y + self.height):
+            return None
+        origin_x, origin_y = self.origin()
+        col = (x - origin_x) // self.cell_size
+        row = (y - origin_y) // self.cell_size
+        if 0 <= row < self.grid_size and 0 <= col < self.grid_size:
+            return row, col
+        return None
+
+    def center_on(self, row, col):
+        # 滚动到让 (row, col) 位于显示区域中央
+        self.scroll_x = col * self.cell_size + self.cell_size // 2 - self.width // 2
+        self.scroll_y = row * self.cell_size + self.cell_size // 2 - self.height // 2
+        self.clamp()
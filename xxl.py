@@ -1,149 +1,675 @@
+import argparse
+import os
 import pygame
 import sys
-import random
 import time
+from collections import deque
 
-# 初始化pygame
-pygame.init()
-pygame.key.set_repeat(500, 100)  # 设置键盘重复响应
+from textcache import TextCache
+from fonts import load_fonts
+from sprites import TileSprites
+from viewport import Viewport
+from animation import AnimationStore
+from replay import Recorder
+import snapshot
+from profiler import FrameProfiler
+from solver import Solver, background_workers, board_key
+from engine import Engine, GRID_SIZE, COLORS, EVENT_REMOVE, EVENT_FALL, EVENT_SPAWN, EVENT_SCORE, EVENT_SHUFFLE
 
-# 游戏常量
+# 界面常量
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 700  # 增加屏幕高度，避免重叠
-GRID_SIZE = 8
 CELL_SIZE = 60
 MARGIN = 50
-ANIMATION_SPEED = 10
-COLORS = [
-    (255, 0, 0),    # 红色
-    (0, 255, 0),    # 绿色
-    (0, 0, 255),    # 蓝色
-    (255, 255, 0),  # 黄色
-    (255, 0, 255),  # 紫色
-    (0, 255, 255),  # 青色
-]
-GAME_TIME = 60  # 游戏时间（秒）
-TARGET_SCORE = 1000  # 通关目标分数
-
-# 创建游戏窗口
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("开心消消乐")
-
-# 加载字体 - 使用支持中文的字体
-try:
-    # 尝试加载系统中常见的中文字体
-    font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti TC"], 36)
-    big_font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti TC"], 72)
-    small_font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti TC"], 24)
-    medium_font = pygame.font.SysFont(["SimHei", "WenQuanYi Micro Hei", "Heiti TC"], 48)
-except:
-    # 如果找不到中文字体，使用默认字体
-    print("警告: 无法加载中文字体，将使用默认字体")
-    font = pygame.font.SysFont(None, 36)
-    big_font = pygame.font.SysFont(None, 72)
-    small_font = pygame.font.SysFont(None, 24)
-    medium_font = pygame.font.SysFont(None, 48)
-
-class Game:
-    def __init__(self):
-        self.grid = []
+BOARD_RECT = (MARGIN, MARGIN + 120, 8 * CELL_SIZE, 8 * CELL_SIZE)  # 棋盘显示区域，大棋盘在其中滚动和缩放
+ANIMATION_SPEED = 600  # 动画速度（像素/秒）
+LOGIC_STEP = 1 / 60  # 游戏逻辑的固定步长（秒）
+MAX_FRAME_TIME = 0.25  # 单帧最多追赶的逻辑时间，避免卡顿后连续补帧
+RENDER_FPS = 120  # 绘制帧率上限
+IDLE_WAIT_MS = 1000  # 空闲时等待事件的超时（毫秒）
+PROFILER_RECT = (560, 220, 230, 460)  # 分析面板位置，放在棋盘右侧的空白区域
+PROFILER_REFRESH = 15  # 分析面板每隔多少帧刷新一次
+SCROLL_KEYS = {  # 方向键对应的滚动方向，每次滚动显示区域的四分之一
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_DOWN: (0, 1),
+}
+
+# 窗口和字体在 init_display() 中创建，导入本模块不会产生副作用
+screen = None
+font = None
+big_font = None
+small_font = None
+medium_font = None
+
+# 文字渲染缓存，静态文字和只在数值变化时才变的文字不再每帧重新光栅化
+text_cache = TextCache()
+# 帧分析器，按 F3 或使用 --profile 启动时开启
+profiler = FrameProfiler()
+
+
+def init_display():
+    global screen, font, big_font, small_font, medium_font
+
+    # 只初始化用到的子系统（显示和字体），不初始化音频、手柄等
+    pygame.display.init()
+    pygame.font.init()
+    pygame.key.set_repeat(500, 100)  # 设置键盘重复响应
+
+    # 创建游戏窗口
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("开心消消乐")
+
+    # 加载字体 - 使用支持中文的字体，字体文件路径缓存在磁盘上，每个字号只加载一次
+    fonts = load_fonts((36, 72, 24, 48))
+    font, big_font, small_font, medium_font = fonts[36], fonts[72], fonts[24], fonts[48]
+
+
+# 方块精灵按格子大小缓存，缩放时只在第一次用到某个尺寸时生成
+# （需要在创建窗口之后才能转换为显示格式）
+_sprites = {}
+
+
+def tile_sprites(cell_size):
+    tiles = _sprites.get(cell_size)
+    if tiles is None:
+        tiles = _sprites[cell_size] = TileSprites(cell_size, COLORS)
+    return tiles
+
+
+# 半透明遮罩和弹窗背景按 (宽, 高, 颜色) 缓存，避免每帧重新分配
+_panels = {}
+
+
+def cached_panel(width, height, color):
+    key = (width, height, color)
+    panel = _panels.get(key)
+    if panel is None:
+        panel = _panels[key] = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill(color)
+    return panel
+
+
+class Game(Engine):
+    # pygame 前端：规则由 Engine 负责，这里只负责绘制、动画和输入
+    def __init__(self, **kwargs):
         self.selected = None
-        self.score = 0
-        self.animations = []
-        self.game_over = False
-        self.victory = False
+        self.animations = AnimationStore()
+        # 回放状态：引擎一次性结算连锁，前端按连锁层逐层回放事件日志
+        self.view = []  # 当前显示的棋盘
+        self.display_score = 0  # 当前显示的分数
+        self.playback = deque()  # 等待回放的连锁层，每项是一层的事件列表
+        self.hint_move = None  # 按 H 键显示的提示交换
+        self.recorder = None  # 录像记录器，为 None 时不录像
+        self.solver = None  # 前瞻求解器，设置后 H 键提示在后台计算
+        self.auto_play = False  # 是否由求解器自动走棋
+        self.show_profiler = False  # 是否显示帧分析面板
         self.show_instructions = False  # 控制是否显示游戏说明
-        self.paused = False  # 控制游戏是否暂停
-        self.pause_start_time = 0  # 暂停开始时间
-        self.pause_duration = 0  # 累计暂停时间
-        self.initialize_grid()
-        self.reset_game()
-        
+        self.viewport = None  # 棋盘视口，棋盘大小确定后创建
+        # 脏矩形绘制状态
+        self.background = None  # 缓存的静态背景层
+        self.dirty_rects = []  # 本帧需要提交到屏幕的区域
+        self.full_redraw = True
+        self.board_dirty = True  # 整块棋盘需要重绘（滚动、缩放、换棋盘、洗牌）
+        self.redraw_cells = set()  # 显示内容变化、需要重绘的格子
+        self.drawn_moving = {}  # 上一帧画在动画偏移位置的方块 -> 覆盖的屏幕区域
+        self.render_ahead = 0.0
+        self.drawn_overlays = None
+        self.drawn_score_text = None
+        self.drawn_time_text = None
+        self.drawn_fps_text = None
+        self.drawn_profiler_frame = None
+        self.score_rect = None
+        self.time_rect = None
+        self.fps_rect = None
+        super().__init__(**kwargs)
+        self.viewport = Viewport.fit(BOARD_RECT, self.grid_size, CELL_SIZE)
+
+    def initialize_grid(self):
+        super().initialize_grid()
+        self.view = [list(line) for line in self.grid]
+        self.hint_move = None
+        self.animations.clear()
+        self.playback.clear()
+        self.invalidate_board()
+
+    def set_grid(self, grid, moves=None):
+        super().set_grid(grid, moves)
+        self.view = [list(line) for line in self.grid]
+        self.hint_move = None
+        self.animations.clear()
+        self.playback.clear()
+        self.invalidate_board()
+
+    def save_snapshot(self):
+        # 快照只保存稳定的棋盘，未结算的连锁先结算（仍按层回放）
+        self.finish_cascade()
+        return snapshot.save(self)
+
+    def load_snapshot(self, data):
+        # 恢复快照（包括进行中的动画和等待回放的连锁），棋盘大小变化时重新适配视口
+        size = self.grid_size
+        snapshot.restore(self, data)
+        if self.grid_size != size:
+            self.viewport = Viewport.fit(BOARD_RECT, self.grid_size, CELL_SIZE)
+        self.hint_move = None
+        if self.solver is not None:
+            self.solver.cancel()
+        self.show_final_board()
+        self.invalidate_all()
+
+    def restart(self):
+        super().restart()
+        if self.recorder is not None:
+            self.recorder.record_restart()
+
+    def begin_move(self, pos1, pos2, record=True):
+        # 连锁不在点击时一次算完：每播放完一层再结算下一层（见 queue_next_level）
+        with profiler.section("match"):
+            log = super().begin_move(pos1, pos2, record)
+        if log is not None and self.recorder is not None:
+            self.recorder.record_swap(pos1, pos2)
+        return log
+
+    def resolve_level(self):
+        with profiler.section("match"):
+            return super().resolve_level()
+
     def reset_game(self):
         # 重置游戏状态
-        self.score = 0
-        self.game_over = False
-        self.victory = False
+        super().reset_game()
+        self.display_score = 0
         self.show_instructions = False
-        self.paused = False
-        self.pause_start_time = 0
-        self.pause_duration = 0
-        self.start_time = time.time()
-        self.end_time = self.start_time + GAME_TIME  # 设置结束时间
+
+    def can_move(self):
+        # 回放连锁时棋盘尚未稳定，不能走棋也不显示提示
+        return not self.game_over and not self.paused and not self.is_playing()
+
+    def show_hint(self):
+        if not self.can_move():
+            return
+        if self.solver is not None:
+            # 前瞻求解在后台进行，结果由 poll_solver 取回
+            self.solver.request(self)
+            return
+        self.set_hint(self.hint())
+
+    def set_hint(self, move):
+        self.invalidate_cells(self.marked_cells())
+        self.hint_move = move
+        if move is not None:
+            # 大棋盘上提示的交换可能在视口之外，滚动过去
+            row, col = move[0]
+            row0, row1, col0, col1 = self.viewport.visible_range()
+            if not (row0 <= row < row1 and col0 <= col < col1):
+                self.viewport.center_on(row, col)
+                self.invalidate_board()
+        self.invalidate_cells(self.marked_cells())
+
+    def toggle_auto_play(self):
+        # 自动玩需要求解器，没有时创建一个
+        self.auto_play = not self.auto_play
+        if self.solver is None:
+            self.solver = Solver(background_workers())
+        if not self.auto_play:
+            self.solver.cancel()
+
+    def poll_solver(self):
+        # 每帧调用一次：取回后台求解的结果，自动玩时把它走出去并提交下一次求解
+        # 求解期间局面已经变化（玩家走了别的交换或重新开始）时丢弃结果
+        if self.solver is None:
+            return
+        result = self.solver.poll()
+        if result is not None:
+            key, move = result
+            if move is None or key != board_key(self.grid) or not self.can_move():
+                return
+            if self.auto_play:
+                log = self.begin_move(*move)
+                if log is not None:
+                    self.invalidate_cells(self.marked_cells())
+                    self.selected = None
+                    self.hint_move = None
+                    self.start_playback(log)
+            else:
+                self.set_hint(move)
+        elif self.auto_play and self.solver.pending is None and self.can_move():
+            self.solver.request(self)
+
+    def is_playing(self):
+        return bool(self.animations or self.playback) or self.cascade_log is not None
+
+    def update_timer(self):
+        super().update_timer()
+        self.show_final_board()
+
+    def show_final_board(self):
+        # 游戏结束后动画冻结，剩余的连锁不再回放：直接显示结算后的棋盘和分数，结束画面随即出现
+        if not self.game_over or not (self.playback or self.animations or self.display_score != self.score
+                                      or self.view != self.grid):
+            return
+        self.playback.clear()
+        self.animations.clear()
+        self.view = [list(line) for line in self.grid]
+        self.display_score = self.score
+        self.invalidate_board()
+
+    def animations_frozen(self):
+        # 暂停或游戏结束时动画停在原处（通关后的暂停除外，剩余连锁继续回放）
+        return self.game_over or (self.paused and not self.victory)
+
+    def is_idle(self):
+        # 动画冻结，或通关、查看说明且没有动画时画面不会变化，主循环可以阻塞等待事件
+        if self.animations_frozen():
+            return True
+        return not self.is_playing() and (self.show_instructions or self.victory)
+
+    def add_slide_animation(self, row, col, dx, dy):
+        # 方块从偏移 (dx, dy) 处滑回格子，耗时与距离成正比
+        distance = max(abs(dx), abs(dy))
+        self.animations.add(row, col, "slide", dx, dy, distance / ANIMATION_SPEED)
+        # 方块离开格子上原来画着的位置，那里也要重绘
+        self.redraw_cells.add((row, col))
+
+    def add_swap_animation(self, pos1, pos2, fraction=1.0):
+        # 添加交换动画：两个方块从对方的位置滑到自己的格子
+        # fraction < 1 时只移动一部分距离，用于无效交换的弹回效果
+        row1, col1 = pos1
+        row2, col2 = pos2
+        dx = (col2 - col1) * CELL_SIZE * fraction
+        dy = (row2 - row1) * CELL_SIZE * fraction
+        self.add_slide_animation(row1, col1, dx, dy)
+        self.add_slide_animation(row2, col2, -dx, -dy)
+
+    def start_playback(self, log):
+        # 第 0 层是交换，之后每一层依次是消除、下落、生成和得分
+        (_, pos1, pos2), events = log[0], log[1:]
+        (row1, col1), (row2, col2) = pos1, pos2
+        view = self.view
+        view[row1][col1], view[row2][col2] = view[row2][col2], view[row1][col1]
+        self.add_swap_animation(pos1, pos2)
+        self.invalidate_cells((pos1, pos2))
+        self.queue_levels(events)
+
+    def queue_levels(self, events):
+        # 按得分事件把事件日志切分成连锁层加入回放队列
+        level_events = []
+        for event in events:
+            level_events.append(event)
+            if event[0] == EVENT_SCORE:
+                self.playback.append(level_events)
+                level_events = []
+        if level_events:
+            # 连锁结束后的死局洗牌单独作为一层回放
+            self.playback.append(level_events)
+
+    def queue_next_level(self):
+        # 结算一层连锁并加入回放队列，大棋盘上每次只花一层的计算时间
+        log = self.cascade_log
+        start = len(log)
+        self.resolve_level()
+        self.queue_levels(log[start:])
+
+    def finish_cascade(self):
+        # 结算完剩余的连锁，结果照常逐层回放（保存快照前调用）
+        while self.cascade_log is not None:
+            self.queue_next_level()
+
+    def play_next_level(self):
+        # 把一层连锁应用到显示棋盘上并生成对应动画
+        if not self.playback:
+            self.queue_next_level()
+            if not self.playback:
+                return
+        view = self.view
+        changed = self.redraw_cells
+        events = self.playback.popleft()
+        # 每列新生成的方块数，新方块从网格上方整体落入
+        spawned = {}
+        for event in events:
+            if event[0] == EVENT_SPAWN:
+                spawned[event[3]] = spawned.get(event[3], 0) + 1
+        for event in events:
+            kind = event[0]
+            if kind == EVENT_REMOVE:
+                for row, col in event[2]:
+                    view[row][col] = -1
+                changed.update(event[2])
+            elif kind == EVENT_FALL:
+                _, _, row, col, to_row = event
+                view[to_row][col] = view[row][col]
+                view[row][col] = -1
+                changed.add((row, col))
+                changed.add((to_row, col))
+                # 添加下落动画：方块从原来的位置落到目标格子
+                self.add_slide_animation(to_row, col, 0, (row - to_row) * CELL_SIZE)
+            elif kind == EVENT_SPAWN:
+                _, _, row, col, color = event
+                view[row][col] = color
+                changed.add((row, col))
+                # 添加新方块动画
+                self.add_slide_animation(row, col, 0, -spawned[col] * CELL_SIZE)
+            elif kind == EVENT_SCORE:
+                self.display_score += event[2]
+            elif kind == EVENT_SHUFFLE:
+                self.view = view = [list(line) for line in event[2]]
+                self.invalidate_board()
+                # 大棋盘上只落下一个显示区域的高度，避免动画过长
+                distance = min(self.grid_size * CELL_SIZE, BOARD_RECT[3])
+                for row in range(self.grid_size):
+                    for col in range(self.grid_size):
+                        self.add_slide_animation(row, col, 0, -distance)
+
+    def invalidate_board(self):
+        self.board_dirty = True
+
+    def invalidate_cells(self, cells):
+        self.redraw_cells.update(cells)
+
+    def marked_cells(self):
+        # 画着选中框或提示框的格子
+        cells = [self.selected] if self.selected is not None else []
+        if self.hint_move:
+            cells.extend(self.hint_move)
+        return cells
+
+    def invalidate_all(self):
+        self.full_redraw = True
+
+    def scroll_view(self, dx, dy):
+        if self.viewport.scroll(dx, dy):
+            self.invalidate_board()
+
+    def zoom_view(self, steps, anchor=None):
+        if self.viewport.zoom(steps, anchor):
+            self.invalidate_board()
+
+    def grid_rect(self):
+        x, y, width, height = BOARD_RECT
+        return pygame.Rect(
+            x - 10, 
+            y,  # 下移网格位置，避免重叠
+            width + 20, 
+            height + 20
+        )
+
+    def build_background(self):
+        # 静态背景层：背景色、标题、操作提示和网格底板，只绘制一次
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        background.fill((30, 30, 50))
         
-    def initialize_grid(self):
-        # 创建初始网格
-        self.grid = []
-        for _ in range(GRID_SIZE):
-            row = []
-            for _ in range(GRID_SIZE):
-                row.append(random.choice(range(len(COLORS))))
-            self.grid.append(row)
+        # 绘制标题
+        title = text_cache.render(big_font, "开心消消乐", (255, 215, 0))
+        background.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 10))
         
-        # 确保初始网格没有可消除的组合
-        while self.find_matches():
-            self.remove_matches()
-            self.fill_empty_cells()
-    
-    def draw(self):
-        # 绘制背景
-        screen.fill((30, 30, 50))
+        # 绘制操作提示
+        hint_text = text_cache.render(small_font, "按 I 键查看说明 | 按 P 键暂停游戏", (200, 200, 200))
+        background.blit(hint_text, (SCREEN_WIDTH - hint_text.get_width() - 20, 80))
+        hint_key_text = text_cache.render(small_font, "按 H 键提示可消除的交换 | 按 A 键自动玩", (200, 200, 200))
+        background.blit(hint_key_text, (SCREEN_WIDTH - hint_key_text.get_width() - 20, 110))
+        if self.grid_size * CELL_SIZE > BOARD_RECT[2]:
+            view_text = text_cache.render(small_font, "方向键/右键拖动滚动 | +/- 或滚轮缩放", (200, 200, 200))
+            background.blit(view_text, (SCREEN_WIDTH - view_text.get_width() - 20, 140))
         
-        # 绘制标题
-        title = big_font.render("开心消消乐", True, (255, 215, 0))
-        screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 10))
+        # 绘制网格背景
+        grid_rect = self.grid_rect()
+        pygame.draw.rect(background, (50, 50, 70), grid_rect)
+        pygame.draw.rect(background, (100, 100, 150), grid_rect, 3)
+        self.background = background
+
+    def overlay_state(self):
+        # 当前显示的弹窗，变化时需要整屏重绘
+        return (
+            self.show_instructions,
+            self.paused and not self.show_instructions,
+            (self.game_over or self.victory) and not self.playback and self.cascade_log is None,
+        )
+
+    def draw(self, alpha=0.0):
+        # 脏矩形绘制：只重绘发生变化的区域，画面完全静止时不提交任何更新
+        # alpha 是距上一个逻辑步已经过去的比例，用于在两个逻辑步之间插值动画
+        # 冻结的动画不插值，也不算画面变化
+        frozen = self.animations_frozen()
+        self.render_ahead = 0.0 if frozen else alpha * LOGIC_STEP
+        if self.background is None:
+            self.build_background()
+        # 动画结束后的那一帧也要重绘，把方块画在最终位置
+        moving = not frozen and bool(self.animations or self.drawn_moving)
+        board_changed = bool(self.board_dirty or self.redraw_cells or moving)
+        
+        overlays = self.overlay_state()
+        if overlays != self.drawn_overlays:
+            self.full_redraw = True
+        elif any(overlays) and (board_changed or self.hud_changed()):
+            # 弹窗下方的内容变化时，弹窗也要一起重绘
+            self.full_redraw = True
         
+        if self.full_redraw:
+            screen.blit(self.background, (0, 0))
+            self.drawn_score_text = None
+            self.drawn_time_text = None
+            self.drawn_fps_text = None
+            self.drawn_profiler_frame = None
+            with profiler.section("draw.text"):
+                self.draw_hud()
+            with profiler.section("draw.board"):
+                self.board_dirty = True
+                self.draw_board()
+            with profiler.section("draw.overlay"):
+                self.draw_overlays()
+            self.drawn_overlays = overlays
+            self.full_redraw = False
+            self.dirty_rects = [screen.get_rect()]
+            return
+        
+        with profiler.section("draw.text"):
+            self.draw_hud()
+        if board_changed:
+            with profiler.section("draw.board"):
+                self.draw_board()
+
+    def hud_texts(self):
         # 合并显示分数和目标分数
-        score_text = font.render(f"得分/目标: {self.score}/{TARGET_SCORE}", True, (255, 255, 255))
-        screen.blit(score_text, (20, 80))
+        score = f"得分/目标: {self.display_score}/{self.target_score}"
         
         # 绘制游戏倒计时
         remaining_time = max(0, int(self.get_remaining_time()))
         minutes = remaining_time // 60
         seconds = remaining_time % 60
-        time_text = font.render(f"剩余时间: {minutes:02d}:{seconds:02d}", True, (255, 255, 255))
-        screen.blit(time_text, (20, 130))
-        
-        # 绘制操作提示
-        hint_text = small_font.render("按 I 键查看说明 | 按 P 键暂停游戏", True, (200, 200, 200))
-        screen.blit(hint_text, (SCREEN_WIDTH - hint_text.get_width() - 20, 80))
+        return score, f"剩余时间: {minutes:02d}:{seconds:02d}"
+
+    def hud_changed(self):
+        return self.hud_texts() != (self.drawn_score_text, self.drawn_time_text)
+
+    def draw_text_region(self, text, pos, old_rect):
+        # 恢复旧文字所在的背景，再绘制新文字，返回需要提交的区域
+        surface = text_cache.render(font, text, (255, 255, 255))
+        rect = surface.get_rect(topleft=pos)
+        dirty = rect.union(old_rect) if old_rect else rect
+        screen.blit(self.background, dirty, dirty)
+        screen.blit(surface, rect)
+        self.dirty_rects.append(dirty)
+        return rect
+
+    def draw_hud(self):
+        # 分数和时间只在数值变化时重绘
+        score_text, time_text = self.hud_texts()
+        if score_text != self.drawn_score_text:
+            self.score_rect = self.draw_text_region(score_text, (20, 80), self.score_rect)
+            self.drawn_score_text = score_text
+        if time_text != self.drawn_time_text:
+            self.time_rect = self.draw_text_region(time_text, (20, 130), self.time_rect)
+            self.drawn_time_text = time_text
+
+    def draw_fps(self, fps):
+        fps_text = f"FPS: {fps}"
+        if fps_text == self.drawn_fps_text:
+            return
+        surface = text_cache.render(font, fps_text, (200, 200, 200))
+        rect = surface.get_rect(topleft=(SCREEN_WIDTH - 120, 180))
+        if self.drawn_fps_text is None:
+            # 整屏重绘后直接画在最上层
+            dirty = rect
+        elif any(self.drawn_overlays):
+            # 弹窗显示期间帧率读数保持不变，避免擦掉弹窗
+            return
+        else:
+            dirty = rect.union(self.fps_rect)
+            screen.blit(self.background, dirty, dirty)
+        screen.blit(surface, rect)
+        self.dirty_rects.append(dirty)
+        self.fps_rect = rect
+        self.drawn_fps_text = fps_text
+
+    def draw_board(self):
+        # 整块棋盘失效时恢复网格底板并重绘整个显示区域；否则只重绘内容变化的格子
+        # 和移动中的方块在上一帧、这一帧覆盖的区域，相交的区域合并后逐块重绘并提交
+        board = pygame.Rect(BOARD_RECT)
+        moving = self.moving_rects()
+        rects = None if self.board_dirty else self.changed_rects(moving, board)
+        if rects is None:
+            grid_rect = self.grid_rect()
+            screen.blit(self.background, grid_rect, grid_rect)
+            redrawn = self.draw_tiles(board)
+            self.dirty_rects.append(grid_rect)
+        else:
+            redrawn = 0
+            for rect in rects:
+                screen.blit(self.background, rect, rect)
+                redrawn += self.draw_tiles(rect)
+            self.dirty_rects.extend(rects)
+        profiler.count("cells_redrawn", redrawn)
+        self.drawn_moving = moving
+        self.redraw_cells.clear()
+        self.board_dirty = False
+
+    def moving_rects(self):
+        # 活动动画的方块这一帧覆盖的屏幕区域（向外扩出选中框的宽度）
+        viewport = self.viewport
+        cell_size = viewport.cell_size
+        scale = cell_size / CELL_SIZE
+        gap = tile_sprites(cell_size).gap
+        size = cell_size + 2 * gap + 2
+        origin_x, origin_y = viewport.origin()
+        animations = self.animations
+        ahead = self.render_ahead
+        moving = {}
+        for row, col in animations.active:
+            dx, dy = animations.offset(row, col, ahead)
+            x = origin_x + col * cell_size + dx * scale
+            y = origin_y + row * cell_size + dy * scale
+            moving[(row, col)] = pygame.Rect(int(x) - gap - 1, int(y) - gap - 1, size, size)
+        return moving
+
+    def changed_rects(self, moving, board):
+        # 需要重绘的区域：变化的格子、这一帧和上一帧移动中的方块，以及动画刚结束的格子
+        # 裁剪到显示区域并把相交的矩形合并；变化太多时返回 None，整块重绘更便宜
+        viewport = self.viewport
+        cell_size = viewport.cell_size
+        gap = tile_sprites(cell_size).gap
+        cells = set(self.redraw_cells)
+        cells.update(cell for cell in self.drawn_moving if cell not in moving)
+        row0, row1, col0, col1 = viewport.visible_range()
+        if (len(cells) + len(moving) + len(self.drawn_moving)) * 2 > (row1 - row0) * (col1 - col0):
+            return None
+        rects = []
+        for row, col in cells:
+            x, y = viewport.cell_to_screen(row, col)
+            rects.append(pygame.Rect(x - gap, y - gap, cell_size + 2 * gap, cell_size + 2 * gap))
+        rects.extend(moving.values())
+        rects.extend(self.drawn_moving.values())
+        merged = []
+        for rect in rects:
+            rect = rect.clip(board)
+            if not rect:
+                continue
+            index = rect.collidelist(merged)
+            while index >= 0:
+                rect = rect.union(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def draw_tiles(self, clip):
+        # 在 clip 区域内重绘所有与它相交的方块和选中/提示框，绘制顺序与整块重绘相同：
+        # 先按行列顺序画可见范围内的方块（移动中的画在偏移位置），再画可见范围外滑入的方块
+        viewport = self.viewport
+        cell_size = viewport.cell_size
+        scale = cell_size / CELL_SIZE  # 动画位移按标准格子大小记录，绘制时缩放
+        tile_set = tile_sprites(cell_size)
+        tiles = tile_set.tiles
+        animations = self.animations
+        ahead = self.render_ahead
+        view = self.view
+        origin_x, origin_y = viewport.origin()
+        visible = viewport.visible_range()
+        vrow0, vrow1, vcol0, vcol1 = visible
+        # 与 clip 相交的格子范围
+        row0 = max(vrow0, (clip.top - origin_y) // cell_size)
+        row1 = min(vrow1, -(-(clip.bottom - origin_y) // cell_size))
+        col0 = max(vcol0, (clip.left - origin_x) // cell_size)
+        col1 = min(vcol1, -(-(clip.right - origin_x) // cell_size))
         
-        # 绘制网格背景
-        grid_rect = pygame.Rect(
-            MARGIN - 10, 
-            MARGIN + 120,  # 下移网格位置，避免重叠
-            GRID_SIZE * CELL_SIZE + 20, 
-            GRID_SIZE * CELL_SIZE + 20
-        )
-        pygame.draw.rect(screen, (50, 50, 70), grid_rect)
-        pygame.draw.rect(screen, (100, 100, 150), grid_rect, 3)
+        # 范围外移动中的方块可能滑进 clip（例如从上方落下），逐个检查活动动画
+        extra = []
+        outside = []
+        for row, col in animations.active:
+            if row0 <= row < row1 and col0 <= col < col1:
+                continue
+            if view[row][col] < 0:
+                continue
+            dx, dy = animations.offset(row, col, ahead)
+            x = origin_x + col * cell_size + dx * scale
+            y = origin_y + row * cell_size + dy * scale
+            if clip.colliderect((x, y, cell_size, cell_size)):
+                if vrow0 <= row < vrow1 and vcol0 <= col < vcol1:
+                    extra.append((row, col))
+                else:
+                    outside.append((row, col, x, y))
         
-        # 绘制网格中的方块
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                x = MARGIN + col * CELL_SIZE
-                y = MARGIN + 120 + row * CELL_SIZE  # 下移方块位置
-                
-                # 检查是否有动画
-                animating = False
-                for anim in self.animations:
-                    if anim[0] == row and anim[1] == col:
-                        x += anim[4][0]
-                        y += anim[4][1]
-                        animating = True
-                        break
-                
-                # 绘制方块
-                color_idx = self.grid[row][col]
-                if color_idx >= 0:  # 确保是有效颜色
-                    color = COLORS[color_idx]
-                    pygame.draw.rect(screen, color, (x, y, CELL_SIZE - 4, CELL_SIZE - 4), 0, 10)
-                    pygame.draw.rect(screen, (200, 200, 200), (x, y, CELL_SIZE - 4, CELL_SIZE - 4), 2, 10)
-                
-                # 如果被选中，绘制边框
-                if self.selected and self.selected[0] == row and self.selected[1] == col:
-                    pygame.draw.rect(screen, (255, 255, 255), (x-4, y-4, CELL_SIZE+4, CELL_SIZE+4), 3, 12)
+        # 收集精灵后用一次 blits 批量绘制
+        blits = []
+        if extra:
+            cells = sorted([(row, col) for row in range(row0, row1) for col in range(col0, col1)] + extra)
+        else:
+            cells = ((row, col) for row in range(row0, row1) for col in range(col0, col1))
+        for row, col in cells:
+            color_idx = view[row][col]
+            if color_idx < 0:  # 空格
+                continue
+            x = origin_x + col * cell_size
+            y = origin_y + row * cell_size
+            
+            # 检查是否有动画（按格子索引查找）
+            if (row, col) in animations:
+                dx, dy = animations.offset(row, col, ahead)
+                blits.append((tiles[color_idx], (x + dx * scale, y + dy * scale)))
+            else:
+                blits.append((tiles[color_idx], (x, y)))
+        for row, col, x, y in outside:
+            blits.append((tiles[view[row][col]], (x, y)))
         
+        # 选中的方块用白色边框标出，提示的交换用金色边框标出
+        marks = []
+        if self.selected:
+            marks.append((self.selected, (255, 255, 255)))
+        if self.hint_move:
+            marks.extend((pos, (255, 215, 0)) for pos in self.hint_move)
+        gap = tile_set.gap
+        for (row, col), color in marks:
+            x, y = viewport.cell_to_screen(row, col)
+            dx, dy = animations.offset(row, col, ahead)
+            x += dx * scale - gap
+            y += dy * scale - gap
+            if clip.colliderect((x, y, cell_size + gap, cell_size + gap)):
+                blits.append((tile_set.frame(color), (x, y)))
+        screen.set_clip(clip)
+        screen.blits(blits, False)
+        screen.set_clip(None)
+        return len(blits)
+
+    def draw_overlays(self):
         # 绘制游戏说明弹窗
         if self.show_instructions:
             self.draw_instructions_window()
@@ -152,36 +678,63 @@ class Game:
         if self.paused and not self.show_instructions:
             self.draw_pause_window()
         
-        # 检查游戏是否结束
-        if self.game_over or self.victory:
+        # 检查游戏是否结束（等连锁回放完再显示）
+        if (self.game_over or self.victory) and not self.playback and self.cascade_log is None:
             # 绘制半透明背景
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            screen.blit(overlay, (0, 0))
+            screen.blit(cached_panel(SCREEN_WIDTH, SCREEN_HEIGHT, (0, 0, 0, 180)), (0, 0))
             
             # 绘制游戏结束消息
             if self.victory:
-                message = big_font.render("恭喜通关!", True, (255, 215, 0))
+                message = text_cache.render(big_font, "恭喜通关!", (255, 215, 0))
             else:
-                message = big_font.render("游戏失败!", True, (255, 0, 0))
+                message = text_cache.render(big_font, "游戏失败!", (255, 0, 0))
             screen.blit(message, (SCREEN_WIDTH // 2 - message.get_width() // 2, SCREEN_HEIGHT // 2 - 100))
             
             # 绘制最终分数
-            score_message = font.render(f"最终分数: {self.score}/{TARGET_SCORE}", True, (255, 255, 255))
+            score_message = text_cache.render(font, f"最终分数: {self.score}/{self.target_score}", (255, 255, 255))
             screen.blit(score_message, (SCREEN_WIDTH // 2 - score_message.get_width() // 2, SCREEN_HEIGHT // 2))
             
             # 绘制重新开始提示
-            restart_message = small_font.render("按 R 键重新开始游戏", True, (200, 200, 200))
+            restart_message = text_cache.render(small_font, "按 R 键重新开始游戏", (200, 200, 200))
             screen.blit(restart_message, (SCREEN_WIDTH // 2 - restart_message.get_width() // 2, SCREEN_HEIGHT // 2 + 60))
-    
-    def get_remaining_time(self):
-        # 计算剩余时间
-        if self.paused or self.game_over or self.victory:
-            # 如果游戏暂停、结束或通关，返回暂停/结束时的剩余时间
-            return self.paused_remaining_time
-        else:
-            # 如果游戏进行中，返回实际剩余时间
-            return max(0, self.end_time - time.time())
+
+    def draw_profiler(self):
+        # 分析面板：各阶段耗时的 p50/p95/p99（毫秒）和计数器
+        # 面板文字每次都不同，直接渲染而不进入文字缓存
+        if not self.show_profiler:
+            return
+        if self.drawn_profiler_frame is not None and profiler.frames - self.drawn_profiler_frame < PROFILER_REFRESH:
+            return
+        self.drawn_profiler_frame = profiler.frames
+        rect = pygame.Rect(PROFILER_RECT)
+        screen.blit(self.background, rect, rect)
+        screen.blit(cached_panel(rect.width, rect.height, (0, 0, 0, 160)), rect)
+        phases, counters = profiler.report()
+        lines = ["阶段 p50/p95/p99 ms"]
+        for name in sorted(phases):
+            p50, p95, p99 = phases[name]
+            lines.append(f"{name} {p50:.2f}/{p95:.2f}/{p99:.2f}")
+        for name in sorted(counters):
+            p50, p95, p99 = counters[name]
+            lines.append(f"{name} {p50:.0f}/{p95:.0f}/{p99:.0f}")
+        y = rect.y + 6
+        for line in lines:
+            text = small_font.render(line, True, (180, 255, 180))
+            screen.blit(text, (rect.x + 6, y))
+            y += text.get_height() + 2
+        self.dirty_rects.append(rect)
+
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        if self.show_profiler:
+            profiler.enabled = True
+        self.invalidate_all()
+
+    def present(self):
+        # 只把本帧变化的区域提交到屏幕
+        if self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+            self.dirty_rects = []
     
     def draw_instructions_window(self):
         # 绘制游戏说明弹窗
@@ -191,15 +744,13 @@ class Game:
         window_y = (SCREEN_HEIGHT - window_height) // 2
         
         # 绘制窗口背景
-        window = pygame.Surface((window_width, window_height), pygame.SRCALPHA)
-        window.fill((0, 0, 0, 220))
-        screen.blit(window, (window_x, window_y))
+        screen.blit(cached_panel(window_width, window_height, (0, 0, 0, 220)), (window_x, window_y))
         
         # 绘制窗口边框
         pygame.draw.rect(screen, (255, 215, 0), (window_x, window_y, window_width, window_height), 3)
         
         # 绘制标题
-        title = medium_font.render("游戏说明", True, (255, 215, 0))
+        title = text_cache.render(medium_font, "游戏说明", (255, 215, 0))
         screen.blit(title, (window_x + (window_width - title.get_width()) // 2, window_y + 20))
         
         # 绘制说明内容
@@ -208,7 +759,7 @@ class Game:
             "2. 点击相邻方块进行交换",
             "3. 三个或更多相同方块连在一起即可消除",
             "4. 消除后上方的方块会下落",
-            "5. 游戏时间为60秒，目标分数为1000分",
+            f"5. 游戏时间为{self.game_time}秒，目标分数为{self.target_score}分",
             "6. 按 I 键显示/隐藏说明",
             "7. 按 P 键暂停/继续游戏",
             "8. 按 R 键重新开始游戏",
@@ -216,15 +767,15 @@ class Game:
         ]
         
         for i, text in enumerate(instructions):
-            instr = font.render(text, True, (255, 255, 255))
+            instr = text_cache.render(font, text, (255, 255, 255))
             screen.blit(instr, (window_x + 40, window_y + 80 + i * 40))
         
         # 绘制当前状态提示
-        status_text = small_font.render(f"游戏已暂停 - 得分: {self.score}/{TARGET_SCORE}", True, (255, 215, 0))
+        status_text = text_cache.render(small_font, f"游戏已暂停 - 得分: {self.display_score}/{self.target_score}", (255, 215, 0))
         screen.blit(status_text, (window_x + (window_width - status_text.get_width()) // 2, window_y + window_height - 80))
         
         # 绘制关闭提示
-        close_text = small_font.render("按 I 键关闭并继续游戏", True, (200, 200, 200))
+        close_text = text_cache.render(small_font, "按 I 键关闭并继续游戏", (200, 200, 200))
         screen.blit(close_text, (window_x + (window_width - close_text.get_width()) // 2, window_y + window_height - 40))
     
     def draw_pause_window(self):
@@ -235,305 +786,263 @@ class Game:
         window_y = (SCREEN_HEIGHT - window_height) // 2
         
         # 绘制窗口背景
-        window = pygame.Surface((window_width, window_height), pygame.SRCALPHA)
-        window.fill((0, 0, 0, 220))
-        screen.blit(window, (window_x, window_y))
+        screen.blit(cached_panel(window_width, window_height, (0, 0, 0, 220)), (window_x, window_y))
         
         # 绘制窗口边框
         pygame.draw.rect(screen, (255, 215, 0), (window_x, window_y, window_width, window_height), 3)
         
         # 绘制标题
-        title = medium_font.render("游戏暂停", True, (255, 215, 0))
+        title = text_cache.render(medium_font, "游戏暂停", (255, 215, 0))
         screen.blit(title, (window_x + (window_width - title.get_width()) // 2, window_y + 40))
         
         # 绘制分数和时间
-        score_text = font.render(f"得分/目标: {self.score}/{TARGET_SCORE}", True, (255, 255, 255))
+        score_text = text_cache.render(font, f"得分/目标: {self.display_score}/{self.target_score}", (255, 255, 255))
         screen.blit(score_text, (window_x + (window_width - score_text.get_width()) // 2, window_y + 100))
         
         remaining_time = max(0, int(self.get_remaining_time()))
         minutes = remaining_time // 60
         seconds = remaining_time % 60
-        time_text = font.render(f"剩余时间: {minutes:02d}:{seconds:02d}", True, (255, 255, 255))
+        time_text = text_cache.render(font, f"剩余时间: {minutes:02d}:{seconds:02d}", (255, 255, 255))
         screen.blit(time_text, (window_x + (window_width - time_text.get_width()) // 2, window_y + 150))
         
         # 绘制操作提示
-        resume_text = small_font.render("按 P 键继续游戏", True, (200, 200, 200))
+        resume_text = text_cache.render(small_font, "按 P 键继续游戏", (200, 200, 200))
         screen.blit(resume_text, (window_x + (window_width - resume_text.get_width()) // 2, window_y + 200))
         
-        restart_text = small_font.render("按 R 键重新开始", True, (200, 200, 200))
+        restart_text = text_cache.render(small_font, "按 R 键重新开始", (200, 200, 200))
         screen.blit(restart_text, (window_x + (window_width - restart_text.get_width()) // 2, window_y + 230))
     
     def handle_click(self, pos):
-        # 如果游戏已结束或暂停，不处理点击事件
-        if self.game_over or self.paused:
+        # 如果游戏已结束、暂停或正在回放连锁，不处理点击事件
+        if self.game_over or self.paused or self.is_playing():
             return
             
-        # 将屏幕坐标转换为网格坐标
-        x, y = pos
-        col = (x - MARGIN) // CELL_SIZE
-        row = (y - MARGIN - 120) // CELL_SIZE  # 调整计算方式以适应下移的网格
-        
-        # 检查是否在网格范围内
-        if 0 <= row < GRID_SIZE and 0 <= col < GRID_SIZE:
+        # 将屏幕坐标转换为网格坐标（考虑视口的滚动和缩放），不在网格范围内时为 None
+        cell = self.viewport.screen_to_cell(*pos)
+        if cell is not None:
+            row, col = cell
+            self.invalidate_cells(self.marked_cells())
             if self.selected is None:
                 # 第一次选择
                 self.selected = (row, col)
             else:
-                # 第二次选择 - 尝试交换
-                row1, col1 = self.selected
-                
-                # 检查是否相邻
-                if (abs(row - row1) == 1 and col == col1) or (abs(col - col1) == 1 and row == row1):
-                    # 交换方块
-                    self.swap((row1, col1), (row, col))
-                    
-                    # 检查是否有匹配
-                    if not self.find_matches():
-                        # 如果没有匹配，交换回来
-                        self.swap((row, col), (row1, col1))
+                # 第二次选择 - 尝试交换，引擎一次性结算整个连锁
+                pos1, pos2 = self.selected, (row, col)
+                log = self.begin_move(pos1, pos2)
+                if log is not None:
+                    self.hint_move = None
+                    self.start_playback(log)
+                elif self.is_adjacent(pos1, pos2):
+                    # 如果没有匹配，播放方块向对方靠近再弹回的动画
+                    self.add_swap_animation(pos1, pos2, 0.5)
                 
                 # 重置选择
                 self.selected = None
+            self.invalidate_cells(self.marked_cells())
     
-    def swap(self, pos1, pos2):
-        # 交换两个位置的方块
-        row1, col1 = pos1
-        row2, col2 = pos2
-        self.grid[row1][col1], self.grid[row2][col2] = self.grid[row2][col2], self.grid[row1][col1]
-        
-        # 添加交换动画
-        self.animations.append((
-            row1, col1, 
-            row2, col2,
-            ((col2 - col1) * CELL_SIZE // 2, (row2 - row1) * CELL_SIZE // 2),
-            "swap"
-        ))
-    
-    def find_matches(self):
-        # 查找所有匹配项（水平或垂直三个或更多相同方块）
-        matches = []
-        
-        # 检查水平匹配
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE - 2):
-                if (self.grid[row][col] == self.grid[row][col+1] == self.grid[row][col+2] >= 0):
-                    # 查找匹配的长度
-                    match_length = 3
-                    while col + match_length < GRID_SIZE and self.grid[row][col] == self.grid[row][col+match_length]:
-                        match_length += 1
-                    
-                    # 添加到匹配列表
-                    for i in range(match_length):
-                        matches.append((row, col+i))
-        
-        # 检查垂直匹配
-        for col in range(GRID_SIZE):
-            for row in range(GRID_SIZE - 2):
-                if (self.grid[row][col] == self.grid[row+1][col] == self.grid[row+2][col] >= 0):
-                    # 查找匹配的长度
-                    match_length = 3
-                    while row + match_length < GRID_SIZE and self.grid[row][col] == self.grid[row+match_length][col]:
-                        match_length += 1
-                    
-                    # 添加到匹配列表
-                    for i in range(match_length):
-                        matches.append((row+i, col))
-        
-        # 去重
-        return list(set(matches))
-    
-    def remove_matches(self):
-        # 移除所有匹配的方块并更新分数
-        matches = self.find_matches()
-        
-        if matches:
-            # 添加消除动画
-            for row, col in matches:
-                self.animations.append((row, col, -1, -1, (0, 0), "remove"))
-            
-            # 更新分数
-            self.score += len(matches) * 10
-            
-            # 检查是否达到通关条件
-            if self.score >= TARGET_SCORE:
-                self.victory = True
-                # 通关后停止倒计时
-                self.paused = True
-                self.paused_remaining_time = 0  # 通关后剩余时间为0
-            
-            # 移除方块（设置为-1表示空）
-            for row, col in matches:
-                self.grid[row][col] = -1
-            
-            return True
-        return False
-    
-    def fill_empty_cells(self):
-        # 让上方的方块下落填补空格
-        for col in range(GRID_SIZE):
-            # 从底部向上移动方块
-            empty_row = GRID_SIZE - 1
-            for row in range(GRID_SIZE - 1, -1, -1):
-                if self.grid[row][col] >= 0:
-                    if empty_row != row:
-                        # 移动方块
-                        self.grid[empty_row][col] = self.grid[row][col]
-                        self.grid[row][col] = -1
-                        
-                        # 添加下落动画
-                        self.animations.append((
-                            row, col,
-                            empty_row, col,
-                            (0, (empty_row - row) * CELL_SIZE),
-                            "fall"
-                        ))
-                    empty_row -= 1
-        
-        # 在顶部生成新方块
-        for col in range(GRID_SIZE):
-            for row in range(GRID_SIZE):
-                if self.grid[row][col] == -1:
-                    self.grid[row][col] = random.choice(range(len(COLORS)))
-                    
-                    # 添加新方块动画
-                    self.animations.append((
-                        row, col,
-                        row, col,
-                        (0, -CELL_SIZE),
-                        "new"
-                    ))
-    
-    def update_animations(self):
-        # 如果游戏已结束或暂停，不更新动画
-        if self.game_over or self.paused:
+    def update_animations(self, dt):
+        # 如果游戏已结束或暂停，不更新动画（通关后继续回放剩余连锁）
+        if self.animations_frozen():
             return
             
-        # 更新所有动画
-        completed_animations = []
+        # 按经过的时间推进动画并回收已完成的动画
+        self.animations.update(dt)
         
-        for i, anim in enumerate(self.animations):
-            row, col, target_row, target_col, (dx, dy), anim_type = anim
-            
-            # 根据动画类型更新位置
-            if anim_type == "swap":
-                if abs(dx) > 0 or abs(dy) > 0:
-                    # 更新位置
-                    sign_x = -1 if dx > 0 else 1
-                    sign_y = -1 if dy > 0 else 1
-                    new_dx = dx - sign_x * ANIMATION_SPEED
-                    new_dy = dy - sign_y * ANIMATION_SPEED
-                    
-                    # 确保不会过冲
-                    if (sign_x == 1 and new_dx < 0) or (sign_x == -1 and new_dx > 0):
-                        new_dx = 0
-                    if (sign_y == 1 and new_dy < 0) or (sign_y == -1 and new_dy > 0):
-                        new_dy = 0
-                    
-                    self.animations[i] = (row, col, target_row, target_col, (new_dx, new_dy), anim_type)
-                else:
-                    completed_animations.append(i)
-            
-            elif anim_type == "remove":
-                # 移除动画已完成
-                completed_animations.append(i)
-            
-            elif anim_type == "fall" or anim_type == "new":
-                if dy != 0:
-                    # 更新位置
-                    sign_y = 1 if dy > 0 else -1
-                    new_dy = dy - sign_y * ANIMATION_SPEED
-                    
-                    # 确保不会过冲
-                    if (sign_y == 1 and new_dy < 0) or (sign_y == -1 and new_dy > 0):
-                        new_dy = 0
-                    
-                    self.animations[i] = (row, col, target_row, target_col, (dx, new_dy), anim_type)
-                else:
-                    completed_animations.append(i)
-        
-        # 移除已完成的动画
-        for idx in sorted(completed_animations, reverse=True):
-            self.animations.pop(idx)
-        
-        # 如果没有动画且存在匹配，继续消除
-        if not self.animations and self.find_matches():
-            self.remove_matches()
-            self.fill_empty_cells()
+        # 当前层动画播放完后回放下一层连锁
+        if not self.animations and (self.playback or self.cascade_log is not None):
+            self.play_next_level()
         
         # 检查时间是否用完
-        if self.get_remaining_time() <= 0 and not self.victory:
-            self.game_over = True
-            self.paused = True  # 游戏结束时暂停
+        self.update_timer()
     
     def toggle_pause(self):
         # 切换暂停状态
+        super().toggle_pause()
+        if self.recorder is not None:
+            if self.paused:
+                self.recorder.record_pause()
+            else:
+                self.recorder.record_resume()
         if self.paused:
-            # 恢复游戏
-            self.paused = False
-            # 计算新的结束时间
-            self.end_time = time.time() + self.paused_remaining_time
-            print(f"游戏恢复，剩余时间: {self.paused_remaining_time:.2f}秒")
-        else:
-            # 暂停游戏
-            self.paused = True
-            # 记录当前剩余时间
-            self.paused_remaining_time = max(0, self.end_time - time.time())
             print(f"游戏暂停，剩余时间: {self.paused_remaining_time:.2f}秒")
+        else:
+            print(f"游戏恢复，剩余时间: {self.paused_remaining_time:.2f}秒")
 
-# 创建游戏实例
-game = Game()
 
-# 游戏主循环
-clock = pygame.time.Clock()
+def quit_game(game, trace_path=None, snapshot_path=None):
+    # 退出前保存录像、分析记录和快照，并输出文字缓存的命中统计
+    if snapshot_path:
+        with open(snapshot_path, "wb") as f:
+            f.write(game.save_snapshot())
+        print(f"游戏已挂起到 {snapshot_path}")
+    if trace_path:
+        count = profiler.dump_trace(trace_path)
+        print(f"帧分析记录已保存到 {trace_path}（{count} 个事件）")
+    if game.solver is not None:
+        game.solver.close()
+    if game.recorder is not None:
+        game.recorder.save()
+        print(f"录像已保存到 {game.recorder.path}")
+    stats = text_cache.stats()
+    print(f"文字缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, 命中率 {stats['hit_rate']:.1%}")
+    pygame.quit()
+    sys.exit()
 
-print("游戏已启动，按 I 键查看说明，按 P 键暂停游戏")
 
-while True:
-    # 处理事件
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:  # 左键点击
-                game.handle_click(event.pos)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_r:  # 按R键重置游戏
-                print("检测到 R 键按下，重置游戏")
-                game.initialize_grid()
-                game.reset_game()
-            elif event.key == pygame.K_ESCAPE:  # 按ESC键退出
-                pygame.quit()
-                sys.exit()
-            elif event.key == pygame.K_i:  # 按I键显示/隐藏游戏说明
-                print("检测到 I 键按下，切换说明显示状态")
-                game.show_instructions = not game.show_instructions
-                if game.show_instructions:
-                    # 显示说明时暂停游戏
-                    if not game.paused:
-                        game.toggle_pause()
-                else:
-                    # 关闭说明时，直接恢复游戏
-                    if game.paused:
+def main():
+    parser = argparse.ArgumentParser(description="开心消消乐")
+    parser.add_argument("--seed", type=int, help="随机种子，相同种子生成相同的棋盘")
+    parser.add_argument("--size", type=int, default=GRID_SIZE, help="棋盘大小（每边格子数），大棋盘可以滚动和缩放")
+    parser.add_argument("--record", metavar="PATH", help="把本局操作录制到文件，退出时保存")
+    parser.add_argument("--profile", action="store_true", help="开启帧分析并显示分析面板（F3 切换）")
+    parser.add_argument("--solver", action="store_true", help="H 键提示使用后台前瞻求解器（A 键自动玩时总是使用）")
+    parser.add_argument("--trace", metavar="PATH", help="记录每帧各阶段的耗时，退出时写出 Chrome trace 文件")
+    parser.add_argument("--snapshot", metavar="PATH", help="启动时从快照恢复（文件存在时），退出时把当前对局挂起到快照")
+    parser.add_argument("--startup-time", action="store_true", help="绘制完第一帧后输出启动各阶段用时并退出")
+    args = parser.parse_args()
+    if args.snapshot and args.record:
+        # 录像从种子开始重放，无法从快照中途继续
+        parser.error("--snapshot 不能与 --record 同时使用")
+    if args.trace:
+        profiler.enabled = True
+        profiler.tracing = True
+    began = time.perf_counter()
+
+    # 创建游戏实例（纯逻辑），窗口在棋盘准备好之后才打开
+    game = None
+    if args.snapshot and os.path.exists(args.snapshot):
+        try:
+            with open(args.snapshot, "rb") as f:
+                game = snapshot.load(f.read(), cls=Game)
+                game.show_final_board()
+            print(f"已从 {args.snapshot} 恢复游戏")
+        except (OSError, snapshot.SnapshotError) as e:
+            print(f"警告: 无法恢复快照，开始新游戏: {e}")
+    if game is None:
+        game = Game(grid_size=args.size, seed=args.seed)
+    created = time.perf_counter()
+    init_display()
+    displayed = time.perf_counter()
+    if args.record:
+        game.recorder = Recorder(game, args.record)
+    if args.solver:
+        game.solver = Solver(background_workers())
+    if args.profile:
+        game.toggle_profiler()
+
+    # 游戏主循环
+    clock = pygame.time.Clock()
+    quick_save = None
+
+    print("游戏已启动，按 I 键查看说明，按 P 键暂停游戏")
+
+    # 固定步长循环：逻辑按 LOGIC_STEP 推进，绘制独立进行并在两步之间插值
+    accumulator = 0.0
+    previous = time.perf_counter()
+    while True:
+        idle = game.is_idle()
+        if idle:
+            # 空闲时阻塞等待事件，不再空转重绘
+            events = [pygame.event.wait(IDLE_WAIT_MS)]
+            events.extend(pygame.event.get())
+        else:
+            events = pygame.event.get()
+        profiler.begin_frame()
+        text_misses = text_cache.misses
+        
+        # 处理事件
+        with profiler.section("events"):
+            for event in events:
+                if event.type == pygame.QUIT:
+                    quit_game(game, args.trace, args.snapshot)
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button == 1:  # 左键点击
+                        game.handle_click(event.pos)
+                elif event.type == pygame.MOUSEMOTION:
+                    if event.buttons[2]:  # 按住右键拖动棋盘
+                        game.scroll_view(-event.rel[0], -event.rel[1])
+                elif event.type == pygame.MOUSEWHEEL:  # 滚轮以鼠标位置为中心缩放
+                    game.zoom_view(event.y, pygame.mouse.get_pos())
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_r:  # 按R键重置游戏
+                        print("检测到 R 键按下，重置游戏")
+                        game.restart()
+                    elif event.key == pygame.K_ESCAPE:  # 按ESC键退出
+                        quit_game(game, args.trace, args.snapshot)
+                    elif event.key == pygame.K_i:  # 按I键显示/隐藏游戏说明
+                        print("检测到 I 键按下，切换说明显示状态")
+                        game.show_instructions = not game.show_instructions
+                        if game.show_instructions:
+                            # 显示说明时暂停游戏
+                            if not game.paused:
+                                game.toggle_pause()
+                        else:
+                            # 关闭说明时，直接恢复游戏
+                            if game.paused:
+                                game.toggle_pause()
+                    elif event.key == pygame.K_h:  # 按H键显示提示
+                        game.show_hint()
+                    elif event.key == pygame.K_a:  # 按A键开启/关闭自动玩
+                        game.toggle_auto_play()
+                    elif event.key == pygame.K_F5:  # 按F5键快速保存（内存快照）
+                        quick_save = game.save_snapshot()
+                    elif event.key == pygame.K_F9 and quick_save is not None and game.recorder is None:
+                        # 按F9键恢复快速保存（录像时不能跳回）
+                        game.load_snapshot(quick_save)
+                    elif event.key == pygame.K_F3:  # 按F3键显示/隐藏帧分析面板
+                        game.toggle_profiler()
+                    elif event.key in SCROLL_KEYS:  # 方向键滚动棋盘
+                        dx, dy = SCROLL_KEYS[event.key]
+                        game.scroll_view(dx * BOARD_RECT[2] // 4, dy * BOARD_RECT[3] // 4)
+                    elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):  # 放大
+                        game.zoom_view(1)
+                    elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):  # 缩小
+                        game.zoom_view(-1)
+                    elif event.key == pygame.K_p:  # 按P键暂停/继续游戏
+                        print("检测到 P 键按下，切换暂停状态")
+                        game.show_instructions = False  # 暂停时关闭说明窗口
                         game.toggle_pause()
-            elif event.key == pygame.K_p:  # 按P键暂停/继续游戏
-                print("检测到 P 键按下，切换暂停状态")
-                game.show_instructions = False  # 暂停时关闭说明窗口
-                game.toggle_pause()
     
-    # 更新游戏状态
-    game.update_animations()
+        # 按固定步长更新游戏状态
+        now = time.perf_counter()
+        if idle:
+            # 空闲期间不积累逻辑时间
+            accumulator = 0.0
+        else:
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            with profiler.section("update"):
+                while accumulator >= LOGIC_STEP:
+                    game.update_animations(LOGIC_STEP)
+                    accumulator -= LOGIC_STEP
+                game.poll_solver()
+        previous = now
     
-    # 绘制游戏
-    game.draw()
+        # 绘制游戏
+        game.draw(accumulator / LOGIC_STEP)
     
-    # 显示帧率
-    fps = int(clock.get_fps())
-    fps_text = font.render(f"FPS: {fps}", True, (200, 200, 200))
-    screen.blit(fps_text, (SCREEN_WIDTH - 120, 180))
+        # 显示帧率
+        with profiler.section("draw.text"):
+            game.draw_fps(int(clock.get_fps()))
+        game.draw_profiler()
     
-    # 更新屏幕
-    pygame.display.flip()
+        # 只更新发生变化的区域
+        with profiler.section("flip"):
+            game.present()
+        profiler.count("animations", len(game.animations))
+        profiler.count("text_renders", text_cache.misses - text_misses)
+        profiler.end_frame()
+        if args.startup_time:
+            now = time.perf_counter()
+            print(f"启动用时: 创建棋盘 {(created - began) * 1000:.1f} ms, "
+                  f"初始化显示 {(displayed - created) * 1000:.1f} ms, "
+                  f"首帧 {(now - displayed) * 1000:.1f} ms, 共 {(now - began) * 1000:.1f} ms")
+            pygame.quit()
+            return
     
-    # 控制帧率
-    clock.tick(60)
+        # 控制绘制帧率
+        if not idle:
+            clock.tick(RENDER_FPS)
+
+
+if __name__ == "__main__":
+    main()